@@ -1,20 +1,15 @@
+import numpy as np
 import pandas as pd
 import re
-from datetime import datetime, time, date
+from datetime import datetime
 from dateutil import parser
 import logging
 
+from instrumentacao import etapa
+
 # Configuração de logging para depuração
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Tenta importar openpyxl para exportação em Excel
-try:
-    import openpyxl
-except ImportError:
-    openpyxl = None
-    logging.warning(
-        "Módulo 'openpyxl' não encontrado. A funcionalidade de exportação para Excel não estará disponível. Por favor, instale-o com 'pip install openpyxl'.")
-
 
 def parse_data_hora(texto):
     """
@@ -24,108 +19,321 @@ def parse_data_hora(texto):
     try:
         # Aprimorado para ser mais flexível com o formato
         return parser.parse(texto, dayfirst=True)
-    except (ValueError, parser.ParserError):
+    except (ValueError, OverflowError, parser.ParserError):
         return None
 
 
-def analise_jornada_trabalho(texto_completo, jornada_diaria, carga_horaria_semanal, tempo_intervalo,
-                             salario_bruto, horario_inicio_str, horario_fim_str):
+# Nomes dos dias da semana, indexados por date.weekday()
+DIAS_DA_SEMANA = ["Segunda-feira", "Terça-feira", "Quarta-feira", "Quinta-feira", "Sexta-feira", "Sábado", "Domingo"]
+
+# Mensagens de erro das etapas de extração
+ERRO_SEM_REGISTROS = ("Não foi possível extrair registros válidos do arquivo. "
+                      "Verifique se o formato de data e hora está presente.")
+ERRO_SEM_MENSAGENS_VALIDAS = "Nenhuma mensagem válida (sem mídia ou mensagens apagadas) encontrada para análise."
+ERRO_SEM_REMETENTES = "Nenhuma mensagem dos remetentes selecionados foi encontrada."
+
+# Quantidade de linhas ignoradas exibidas como exemplo no aviso de log
+MAX_EXEMPLOS_LINHAS_IGNORADAS = 3
+
+# Limite de formatos distintos testados antes de recorrer ao dateutil
+MAX_FORMATOS_DETECTADOS = 4
+
+# Linhas lidas entre duas verificações de cancelamento (análises em segundo plano)
+LINHAS_POR_VERIFICACAO = 10000
+
+# Padrão flexível para capturar a data e hora
+PADRAO_MENSAGEM = re.compile(
+    r'^[\[\(\{]?(\d{1,2}[./-]\d{1,2}[./-]\d{2,4}),?\s*(\d{1,2}:\d{2}(?::\d{2})?)[\}\)]?\]?\s*[-]?\s*(.+?):\s(.*)',
+    re.IGNORECASE
+)
+
+# Conteúdos de mídia ou mensagens apagadas, que não contam como registro de jornada
+# (exportações em português e em inglês; comparação sem diferenciar maiúsculas)
+MARCADORES_MIDIA = (
+    "mensagem apagada", "mensagem foi apagada", "você apagou esta mensagem", "mídia oculta",
+    "vídeo ocultado", "imagem ocultada", "áudio ocultado", "vídeo omitido", "imagem omitida", "audio omitido",
+    "áudio omitido", "figurinha omitida", "gif omitido", "documento omitido",
+    "this message was deleted", "you deleted this message", "media omitted", "image omitted",
+    "video omitted", "audio omitted", "sticker omitted", "gif omitted", "document omitted",
+)
+PADRAO_MIDIA = re.compile("|".join(re.escape(marcador) for marcador in MARCADORES_MIDIA), re.IGNORECASE)
+
+# Todo marcador de mídia contém um destes radicais. Testá-los com 'in' é bem mais barato que
+# a busca com o padrão completo, que só é feita nas poucas mensagens que os contêm.
+RADICAIS_MIDIA = ("omit", "ocult", "apag", "delet")
+
+# Remetentes que indicam avisos do sistema, e não mensagens de um participante
+MARCADORES_SISTEMA = ("criptografia", "lista de contatos", "end-to-end encrypted", "contact list")
+
+
+def detectar_formato(data_str, hora_str):
     """
-    Analisa um texto de chat para gerar um relatório de trabalho,
-    incluindo cálculos de horas extras e adicionais com base na CLT.
+    Detecta o formato concreto (strftime) de uma data/hora exportada,
+    ex.: '%d/%m/%y %H:%M' ou '%d.%m.%Y %H:%M:%S'.
     """
-    mensagens_analisadas = []
-    linhas = texto_completo.splitlines()
+    separador = re.search(r'[./-]', data_str)
+    if not separador:
+        return None
+    partes = data_str.split(separador.group())
+    if len(partes) != 3:
+        return None
+    formato_ano = "%Y" if len(partes[2]) == 4 else "%y"
+    formato_hora = "%H:%M:%S" if hora_str.count(":") == 2 else "%H:%M"
+    sep = separador.group()
+    return f"%d{sep}%m{sep}{formato_ano} {formato_hora}"
 
-    # Padrão flexível para capturar a data e hora
-    padrao_regex = re.compile(
-        r'^[\[\(\{]?(\d{1,2}[./-]\d{1,2}[./-]\d{2,4}),?\s*(\d{1,2}:\d{2}(?::\d{2})?)[\}\)]?\]?\s*[-]?\s*(.+?):\s(.*)',
-        re.IGNORECASE
-    )
 
-    ultima_mensagem = None
+def converter_datas_horas(datas_horas):
+    """
+    Converte em lote uma lista de strings 'data hora' para Timestamps.
+    Cada formato presente no arquivo é detectado uma única vez e aplicado
+    com pd.to_datetime; apenas as linhas que não seguem nenhum formato
+    detectado passam pelo dateutil.
+    """
+    serie = pd.Series(datas_horas, dtype=object)
+    convertidas = pd.Series(pd.NaT, index=serie.index, dtype='datetime64[ns]')
+    pendentes = serie.notna()
+    formatos_testados = set()
+
+    # Exportações mescladas podem trazer mais de um formato (ex.: anos com 2 e 4 dígitos)
+    while pendentes.any() and len(formatos_testados) < MAX_FORMATOS_DETECTADOS:
+        formato = None
+        for valor in serie[pendentes]:
+            data_str, _, hora_str = valor.partition(" ")
+            candidato = detectar_formato(data_str, hora_str)
+            if candidato and candidato not in formatos_testados:
+                formato = candidato
+                break
+        if formato is None:
+            break
+        formatos_testados.add(formato)
+        convertidas[pendentes] = pd.to_datetime(serie[pendentes], format=formato, errors='coerce')
+        pendentes = convertidas.isna()
+
+    # Fallback flexível apenas para o que não seguiu nenhum formato detectado
+    if pendentes.any():
+        cache = {valor: parse_data_hora(valor) for valor in pd.unique(serie[pendentes])}
+        convertidas[pendentes] = pd.to_datetime(serie[pendentes].map(cache), errors='coerce')
+
+    return convertidas
+
+
+def converter_data_hora(data_str, hora_str, formatos):
+    """
+    Converte uma única data/hora reaproveitando os formatos já detectados
+    no fluxo (lista 'formatos', atualizada no lugar). Usa o dateutil
+    apenas quando nenhum formato conhecido se aplica.
+    """
+    texto = f"{data_str} {hora_str}"
+    for formato in formatos:
+        try:
+            return datetime.strptime(texto, formato)
+        except ValueError:
+            continue
+
+    formato = detectar_formato(data_str, hora_str)
+    if formato and formato not in formatos and len(formatos) < MAX_FORMATOS_DETECTADOS:
+        try:
+            data_hora = datetime.strptime(texto, formato)
+            formatos.append(formato)
+            return data_hora
+        except ValueError:
+            pass
+
+    return parse_data_hora(texto)
+
+
+def nova_estatistica():
+    """
+    Contadores de leitura compartilhados pelas funções de varredura de
+    linhas. 'midia_valida' indica se houve mídia com data e hora válidas.
+    """
+    return {'linhas': 0, 'linhas_ignoradas': 0, 'exemplos_ignorados': [], 'midia_valida': False}
+
+
+def _ignorar_linha(estatisticas, linha):
+    estatisticas['linhas_ignoradas'] += 1
+    if len(estatisticas['exemplos_ignorados']) < MAX_EXEMPLOS_LINHAS_IGNORADAS:
+        estatisticas['exemplos_ignorados'].append(linha)
+
+
+def _avisar_linhas_ignoradas(estatisticas):
+    """Emite um único aviso com o total de linhas ignoradas, em vez de um por linha."""
+    if estatisticas['linhas_ignoradas']:
+        logging.warning(f"{estatisticas['linhas_ignoradas']} de {estatisticas['linhas']} linhas ignoradas "
+                        f"por não conterem data e hora válidas. Exemplos: {estatisticas['exemplos_ignorados']}")
+
+
+def _verificando_cancelamento(linhas, verificar_cancelamento):
+    """Repassa as linhas, chamando verificar_cancelamento a cada LINHAS_POR_VERIFICACAO."""
+    for indice, linha in enumerate(linhas):
+        if indice % LINHAS_POR_VERIFICACAO == 0:
+            verificar_cancelamento()
+        yield linha
+
+
+def iterar_mensagens(linhas, estatisticas=None):
+    """
+    Percorre as linhas do chat e gera uma tupla
+    (data_str, hora_str, remetente, conteudo, linha, midia) por mensagem,
+    já com as linhas de continuação anexadas ao conteúdo. Avisos do sistema
+    são descartados e 'midia' indica mídia oculta ou mensagem apagada, de
+    modo que a classificação acontece na própria varredura. Linhas lidas e
+    ignoradas são contadas em 'estatisticas' (ver nova_estatistica).
+    """
+    if estatisticas is None:
+        estatisticas = nova_estatistica()
+    atual = None
 
     for linha in linhas:
+        estatisticas['linhas'] += 1
         # Limpa caracteres invisíveis e espaços extras no início da linha
         linha = linha.lstrip('\u200e\u200f').strip()
 
         if not linha:
             continue
 
-        match = padrao_regex.match(linha)
+        match = PADRAO_MENSAGEM.match(linha)
 
         if match:
-            # Se a linha corresponde ao padrão, processamos como uma nova mensagem
-            data_str = match.group(1)
-            hora_str = match.group(2)
-            remetente = match.group(3)
-            conteudo = match.group(4)
-
-            # Tenta converter a data e hora
-            try:
-                data_hora = parse_data_hora(f"{data_str} {hora_str}")
-                if data_hora:
-                    # Ignora linhas de notificação do sistema
-                    if "criptografia" in remetente.lower() or "lista de contatos" in remetente.lower():
-                        ultima_mensagem = None
-                        continue
-
-                    ultima_mensagem = {
-                        'data': data_hora.date(),
-                        'hora': data_hora.time(),
-                        'remetente': remetente,
-                        'conteudo': conteudo.strip()
-                    }
-                    mensagens_analisadas.append(ultima_mensagem)
-                else:
-                    ultima_mensagem = None
-                    logging.warning(f"Erro ao parsear a linha: {linha}. Formato de data e hora não encontrado.")
-
-            except Exception as e:
-                ultima_mensagem = None
-                logging.warning(f"Erro inesperado ao processar a linha: {linha}. Erro: {e}")
-
-        elif ultima_mensagem:
+            # Uma nova mensagem encerra a anterior
+            if atual:
+                yield _encerrar_mensagem(atual)
+
+            data_str, hora_str, remetente, conteudo = match.groups()
+
+            # Ignora linhas de notificação do sistema
+            if eh_aviso_sistema(remetente):
+                atual = None
+                continue
+
+            atual = (data_str, hora_str, remetente, [conteudo.strip()], linha)
+
+        elif atual:
             # Se a linha não tem data/hora, é uma continuação da mensagem anterior
-            ultima_mensagem['conteudo'] += f" {linha.strip()}"
+            atual[3].append(linha)
 
         else:
             # Linha não tem data/hora e não é uma continuação, ignoramos
-            logging.warning(f"Erro ao parsear a linha: {linha}. Formato de data e hora não encontrado.")
+            _ignorar_linha(estatisticas, linha)
+
+    if atual:
+        yield _encerrar_mensagem(atual)
+
+
+def eh_midia(conteudo):
+    """Indica se o conteúdo é mídia oculta ou mensagem apagada (ver MARCADORES_MIDIA)."""
+    minusculo = conteudo.lower()
+    if not any(radical in minusculo for radical in RADICAIS_MIDIA):
+        return False
+    return PADRAO_MIDIA.search(conteudo) is not None
+
+
+def eh_aviso_sistema(remetente):
+    """Indica se a linha é um aviso do sistema (ver MARCADORES_SISTEMA)."""
+    minusculo = remetente.lower()
+    return any(marcador in minusculo for marcador in MARCADORES_SISTEMA)
+
+
+def _encerrar_mensagem(atual):
+    data_str, hora_str, remetente, partes, linha_original = atual
+    conteudo = partes[0] if len(partes) == 1 else " ".join(partes)
+    return data_str, hora_str, remetente, conteudo, linha_original, eh_midia(conteudo)
+
+
+def iterar_dias(linhas, estatisticas=None):
+    """
+    Lê o chat em fluxo (qualquer iterável de linhas, inclusive um arquivo
+    aberto) e gera uma tupla (data, entrada, saida) por dia assim que a
+    data muda, com entrada e saída como datetime. Apenas o estado do dia
+    corrente e da mensagem em andamento ficam em memória.
+    """
+    if estatisticas is None:
+        estatisticas = nova_estatistica()
+    formatos = []
+    dia_atual = entrada = saida = None
+
+    for data_str, hora_str, remetente, conteudo, linha, midia in iterar_mensagens(linhas, estatisticas):
+        # Mídias são descartadas antes da conversão de data e hora; basta saber se havia
+        # alguma com data válida, para o mesmo erro de extrair_dias
+        if midia:
+            if not estatisticas['midia_valida']:
+                estatisticas['midia_valida'] = converter_data_hora(data_str, hora_str, formatos) is not None
+            continue
+
+        data_hora = converter_data_hora(data_str, hora_str, formatos)
+        if data_hora is None:
+            _ignorar_linha(estatisticas, linha)
             continue
 
-    if not mensagens_analisadas:
-        return pd.DataFrame(), {
-            "erro": "Não foi possível extrair registros válidos do arquivo. Verifique se o formato de data e hora está presente."}
+        dia = data_hora.date()
+        if dia != dia_atual:
+            if dia_atual is not None:
+                yield dia_atual, entrada, saida
+            dia_atual, entrada, saida = dia, data_hora, data_hora
+        else:
+            entrada = min(entrada, data_hora)
+            saida = max(saida, data_hora)
 
-    df_mensagens = pd.DataFrame(mensagens_analisadas)
-    df_mensagens = df_mensagens[df_mensagens['data'].notna()]
-    df_mensagens = df_mensagens[df_mensagens['hora'].notna()]
+    if dia_atual is not None:
+        yield dia_atual, entrada, saida
 
-    if df_mensagens.empty:
-        return pd.DataFrame(), {
-            "erro": "Não foi possível extrair registros válidos do arquivo. Verifique se o formato de data e hora está presente."}
 
-    df_mensagens['data'] = pd.to_datetime(df_mensagens['data']).dt.date
+def arredondar(valores, casas=2):
+    """
+    Arredonda uma Series com o round do Python, valor a valor. O .round do
+    pandas arredonda o valor já multiplicado (metade para o par) e, em
+    casos como 16.715, difere em 0.01 do round aplicado ao float original.
+    """
+    return pd.Series([round(valor, casas) for valor in valores.tolist()], index=valores.index, dtype=float)
 
-    # Lógica para remover mensagens de "Mensagem apagada" ou "imagem omitida"
-    df_mensagens = df_mensagens[
-        ~df_mensagens['conteudo'].str.contains(
-            "mensagem apagada|vídeo ocultado|imagem ocultada|áudio ocultado|vídeo omitido|imagem omitida|audio omitido",
-            case=False, na=False)
-    ]
 
-    if df_mensagens.empty:
-        return pd.DataFrame(), {
-            "erro": "Nenhuma mensagem válida (sem mídia ou mensagens apagadas) encontrada para análise."
-        }
+def agregar_dias(df_mensagens):
+    """
+    Agrega as mensagens (coluna 'data_hora') em uma tabela com a entrada
+    e a saída de cada dia, usando um único groupby.
+    """
+    data_hora = df_mensagens['data_hora']
+    return (
+        data_hora.groupby(data_hora.dt.normalize().rename('data'))
+        .agg(entrada='min', saida='max')
+        .reset_index()
+    )
 
+
+def agregar_dias_por_remetente(df_mensagens):
+    """
+    Versão de agregar_dias por pessoa: um único groupby sobre (remetente,
+    dia) gera a entrada e a saída de cada remetente em cada dia, com os
+    remetentes em ordem alfabética.
+    """
+    data_hora = df_mensagens['data_hora']
+    remetente = df_mensagens['remetente'].astype('category')
+    remetente = remetente.cat.reorder_categories(sorted(remetente.cat.categories))
+    return (
+        data_hora.groupby([remetente.rename('remetente'), data_hora.dt.normalize().rename('data')],
+                          observed=True, sort=True)
+        .agg(entrada='min', saida='max')
+        .reset_index()
+    )
+
+
+def calcular_dias_relatorio(df_dias, jornada_diaria, tempo_intervalo, salario_bruto,
+                            horario_inicio_str, horario_fim_str):
+    """
+    Gera as linhas do relatório diário a partir da tabela de dias (colunas
+    'data', 'entrada' e 'saida', como datetime64), com operações vetorizadas
+    sobre as colunas em vez de um laço por dia. Cada linha depende apenas do
+    próprio dia.
+    """
     # Calcula o tempo de trabalho sem o intervalo
     jornada_diaria_sem_intervalo = jornada_diaria - tempo_intervalo
 
-    # Parâmetros para cálculo de horas extras e adicionais
-    horario_inicio_comercial = datetime.strptime(horario_inicio_str, "%H:%M").time()
-    horario_fim_comercial = datetime.strptime(horario_fim_str, "%H:%M").time()
+    # Parâmetros para cálculo de horas extras e adicionais (em segundos desde a meia-noite)
+    horario_inicio_comercial = datetime.strptime(horario_inicio_str, "%H:%M")
+    horario_fim_comercial = datetime.strptime(horario_fim_str, "%H:%M")
+    segundos_inicio_comercial = horario_inicio_comercial.hour * 3600 + horario_inicio_comercial.minute * 60
+    segundos_fim_comercial = horario_fim_comercial.hour * 3600 + horario_fim_comercial.minute * 60
 
     # Taxas CLT (ajustáveis)
     percentual_hora_extra_normal = 1.50  # 50%
@@ -135,112 +343,73 @@ def analise_jornada_trabalho(texto_completo, jornada_diaria, carga_horaria_seman
     # Cálculo do valor da hora normal de trabalho (assumindo 220 horas mensais)
     valor_hora_normal = salario_bruto / 220 if salario_bruto > 0 else 0
 
-    dias = df_mensagens['data'].unique()
-    relatorio = []
-
-    for dia in sorted(dias):
-        mensagens_dia = df_mensagens[df_mensagens['data'] == dia]
-
-        entrada = mensagens_dia['hora'].min()
-        saida = mensagens_dia['hora'].max()
-
-        jornada_total = 0
-        horas_extras = 0
-        custo_horas_extras = 0
-        adicional_noturno = 0
-        observacoes = ""
-
-        if entrada and saida:
-            hora_entrada = datetime.combine(dia, entrada)
-            hora_saida = datetime.combine(dia, saida)
-            jornada_bruta = (hora_saida - hora_entrada).total_seconds() / 3600
-            jornada_liquida = jornada_bruta - tempo_intervalo
-
-            if jornada_liquida > 0:
-                jornada_total = jornada_liquida
-
-            dia_semana_num = dia.weekday()
-            dia_semana_nome = \
-            ["Segunda-feira", "Terça-feira", "Quarta-feira", "Quinta-feira", "Sexta-feira", "Sábado", "Domingo"][
-                dia_semana_num]
-
-            if dia_semana_num >= 5:  # Fim de semana
-                horas_extras = jornada_total
-                observacoes = "Fim de semana"
-            else:  # Dias de semana
-                if jornada_total > jornada_diaria_sem_intervalo:
-                    horas_extras = jornada_total - jornada_diaria_sem_intervalo
-                else:
-                    horas_extras = 0
-
-            # Cálculo do custo da hora extra
-            if horas_extras > 0:
-                if "Fim de semana" in observacoes:
-                    custo_horas_extras = horas_extras * valor_hora_normal * percentual_hora_extra_atipica
-                else:
-                    custo_horas_extras = horas_extras * valor_hora_normal * percentual_hora_extra_normal
-
-            # Adicional Noturno
-            if saida > horario_fim_comercial:
-                # Calcula as horas trabalhadas fora do horário comercial até a saída
-                horas_apos_horario_fim = (datetime.combine(dia, saida) - datetime.combine(dia,
-                                                                                          horario_fim_comercial)).total_seconds() / 3600
-                adicional_noturno = horas_apos_horario_fim * valor_hora_normal * percentual_adicional_noturno
-
-            if entrada < horario_inicio_comercial:
-                observacoes += ", Acionamento atípico" if not observacoes else ", Acionamento atípico"
+    data = df_dias['data'].reset_index(drop=True)
+    entrada = df_dias['entrada'].reset_index(drop=True)
+    saida = df_dias['saida'].reset_index(drop=True)
 
-        else:
-            dia_semana_nome = \
-            ["Segunda-feira", "Terça-feira", "Quarta-feira", "Quinta-feira", "Sexta-feira", "Sábado", "Domingo"][
-                dia.weekday()]
-            entrada = "N/A"
-            saida = "N/A"
-            observacoes = "Registros incompletos"
-            custo_horas_extras = 0
-            adicional_noturno = 0
-            if dia.weekday() >= 5:
-                observacoes += ", Fim de semana"
-
-        relatorio.append({
-            "Data": dia.strftime("%d/%m/%Y"),
-            "Dia da Semana": dia_semana_nome,
-            "Entrada": entrada.strftime("%H:%M") if isinstance(entrada, time) else entrada,
-            "Saída": saida.strftime("%H:%M") if isinstance(saida, time) else saida,
-            "Jornada Total": round(jornada_total, 2),
-            "Horas Extras": round(horas_extras, 2),
-            "Custo Horas Extras": round(custo_horas_extras, 2),
-            "Adicional Noturno": round(adicional_noturno, 2),
-            "Observações": observacoes
-        })
-
-    df_relatorio = pd.DataFrame(relatorio)
-
-    if not df_relatorio.empty:
-        df_relatorio['Data'] = pd.to_datetime(df_relatorio['Data'], format='%d/%m/%Y').dt.date
-        df_relatorio['Jornada Total'] = pd.to_numeric(df_relatorio['Jornada Total'], errors='coerce').fillna(0)
-        df_relatorio['semana_do_ano'] = df_relatorio['Data'].apply(lambda x: x.isocalendar()[1])
-
-        total_semanal_df = df_relatorio.groupby(['semana_do_ano'])['Jornada Total'].sum().reset_index()
-        total_semanal_df['horas_extras_semanais'] = total_semanal_df['Jornada Total'] - carga_horaria_semanal
-        total_semanal_df['horas_extras_semanais'] = total_semanal_df['horas_extras_semanais'].apply(lambda x: max(0, x))
-
-        total_extras_normais = df_relatorio[~df_relatorio['Observações'].str.contains('Fim de semana', na=False)][
-            'Horas Extras'].sum()
-        total_extras_atipicas = df_relatorio[df_relatorio['Observações'].str.contains('Fim de semana', na=False)][
-            'Horas Extras'].sum()
-        total_horas_extras_semanal = total_semanal_df['horas_extras_semanais'].sum()
-
-        custo_total_horas_extras = df_relatorio['Custo Horas Extras'].sum()
-        adicional_noturno_total = df_relatorio['Adicional Noturno'].sum()
-    else:
-        total_extras_normais = 0
-        total_extras_atipicas = 0
-        total_horas_extras_semanal = 0
-        custo_total_horas_extras = 0
-        adicional_noturno_total = 0
-
-    resumo = {
+    segundos_entrada = (entrada - data).dt.total_seconds()
+    segundos_saida = (saida - data).dt.total_seconds()
+
+    jornada_bruta = (saida - entrada).dt.total_seconds() / 3600
+    jornada_total = (jornada_bruta - tempo_intervalo).clip(lower=0)
+
+    dia_semana_num = data.dt.weekday
+    fim_de_semana = (dia_semana_num >= 5).to_numpy()
+
+    # Fim de semana: toda a jornada é extra; dias de semana: apenas o que excede a jornada diária
+    horas_extras = jornada_total.where(fim_de_semana, (jornada_total - jornada_diaria_sem_intervalo).clip(lower=0))
+
+    # Cálculo do custo da hora extra
+    percentual_hora_extra = np.where(fim_de_semana, percentual_hora_extra_atipica, percentual_hora_extra_normal)
+    custo_horas_extras = horas_extras * valor_hora_normal * percentual_hora_extra
+
+    # Adicional Noturno: horas trabalhadas fora do horário comercial até a saída
+    horas_apos_horario_fim = (segundos_saida - segundos_fim_comercial) / 3600
+    adicional_noturno = (horas_apos_horario_fim * valor_hora_normal * percentual_adicional_noturno).where(
+        segundos_saida > segundos_fim_comercial, 0.0)
+
+    observacoes = pd.Series(np.where(fim_de_semana, "Fim de semana", ""), dtype=object)
+    acionamento_atipico = (segundos_entrada < segundos_inicio_comercial).to_numpy()
+    observacoes[acionamento_atipico] = observacoes[acionamento_atipico] + ", Acionamento atípico"
+
+    df_relatorio = pd.DataFrame({
+        "Data": data.dt.date,
+        "Dia da Semana": np.asarray(DIAS_DA_SEMANA, dtype=object)[dia_semana_num.to_numpy()],
+        "Entrada": entrada.dt.strftime("%H:%M"),
+        "Saída": saida.dt.strftime("%H:%M"),
+        "Jornada Total": arredondar(jornada_total),
+        "Horas Extras": arredondar(horas_extras),
+        "Custo Horas Extras": arredondar(custo_horas_extras),
+        "Adicional Noturno": arredondar(adicional_noturno),
+        "Observações": observacoes,
+    })
+    df_relatorio['semana_do_ano'] = data.dt.isocalendar().week.astype(int).to_numpy()
+    return df_relatorio
+
+
+def calcular_semanas(df_relatorio, carga_horaria_semanal, agrupamento=('semana_do_ano',)):
+    """
+    Totaliza a jornada por semana do ano e as horas extras semanais. Com
+    agrupamento=('Remetente', 'semana_do_ano'), a totalização é por pessoa.
+    """
+    total_semanal_df = (df_relatorio.groupby(list(agrupamento), observed=True)['Jornada Total']
+                        .sum().reset_index())
+    total_semanal_df['horas_extras_semanais'] = (total_semanal_df['Jornada Total'] - carga_horaria_semanal).clip(lower=0)
+    return total_semanal_df
+
+
+def resumir_relatorio(df_relatorio, total_semanal_df):
+    """Monta o resumo da análise a partir do relatório diário e dos totais semanais."""
+    fim_de_semana = df_relatorio['Observações'].str.contains('Fim de semana', na=False).to_numpy()
+
+    total_extras_normais = df_relatorio.loc[~fim_de_semana, 'Horas Extras'].sum()
+    total_extras_atipicas = df_relatorio.loc[fim_de_semana, 'Horas Extras'].sum()
+    total_horas_extras_semanal = total_semanal_df['horas_extras_semanais'].sum()
+
+    custo_total_horas_extras = df_relatorio['Custo Horas Extras'].sum()
+    adicional_noturno_total = df_relatorio['Adicional Noturno'].sum()
+
+    return {
         "Total de Horas Extras": round(total_extras_normais + total_extras_atipicas, 2),
         "Horas Extras Normais": round(total_extras_normais, 2),
         "Horas Extras Atípicas": round(total_extras_atipicas, 2),
@@ -248,11 +417,282 @@ def analise_jornada_trabalho(texto_completo, jornada_diaria, carga_horaria_seman
         "Custo Total de Horas Extras": round(custo_total_horas_extras, 2),
         "Adicional Noturno": round(adicional_noturno_total, 2),
         "Inconsistencias":
-            df_relatorio[df_relatorio['Observações'].str.contains('incompleto', case=False, na=False)].shape[
-                0] if not df_relatorio.empty else 0,
+            df_relatorio[df_relatorio['Observações'].str.contains('incompleto', case=False, na=False)].shape[0],
         "Acionamentos atípicos":
-            df_relatorio[df_relatorio['Observações'].str.contains('atípico', case=False, na=False)].shape[
-                0] if not df_relatorio.empty else 0,
+            df_relatorio[df_relatorio['Observações'].str.contains('atípico', case=False, na=False)].shape[0],
     }
 
-    return df_relatorio, resumo
+
+def calcular_relatorio(df_dias, jornada_diaria, carga_horaria_semanal, tempo_intervalo,
+                       salario_bruto, horario_inicio_str, horario_fim_str):
+    """
+    Etapa de cálculo: gera o relatório diário e o resumo a partir da tabela
+    de dias. É barata o suficiente para ser refeita a cada mudança de
+    parâmetro.
+    """
+    if df_dias.empty:
+        return pd.DataFrame(), {"erro": ERRO_SEM_REGISTROS}
+
+    df_relatorio = calcular_dias_relatorio(df_dias, jornada_diaria, tempo_intervalo, salario_bruto,
+                                           horario_inicio_str, horario_fim_str)
+    return df_relatorio, resumir_relatorio(df_relatorio, calcular_semanas(df_relatorio, carga_horaria_semanal))
+
+
+def calcular_relatorio_por_remetente(df_dias_remetentes, jornada_diaria, carga_horaria_semanal, tempo_intervalo,
+                                     salario_bruto, horario_inicio_str, horario_fim_str):
+    """
+    Etapa de cálculo por pessoa, a partir da tabela de agregar_dias_por_remetente.
+    Todas as linhas (remetente, dia) são calculadas de uma vez, como em
+    calcular_dias_relatorio; as semanas e o resumo são totalizados por
+    remetente. Retorna o relatório, com a coluna 'Remetente', e um
+    DataFrame de resumo com uma linha por remetente.
+    """
+    if df_dias_remetentes.empty:
+        return pd.DataFrame(), {"erro": ERRO_SEM_REGISTROS}
+
+    df_relatorio = calcular_dias_relatorio(df_dias_remetentes, jornada_diaria, tempo_intervalo, salario_bruto,
+                                           horario_inicio_str, horario_fim_str)
+    df_relatorio.insert(0, 'Remetente', df_dias_remetentes['remetente'].reset_index(drop=True))
+    total_semanal_df = calcular_semanas(df_relatorio, carga_horaria_semanal, ('Remetente', 'semana_do_ano'))
+    return df_relatorio, resumir_por_remetente(df_relatorio, total_semanal_df)
+
+
+def resumir_por_remetente(df_relatorio, total_semanal_df):
+    """Monta o resumo de resumir_relatorio para cada remetente, com um único groupby."""
+    observacoes = df_relatorio['Observações']
+    fim_de_semana = observacoes.str.contains('Fim de semana', na=False)
+    horas_extras = df_relatorio['Horas Extras']
+
+    totais = pd.DataFrame({
+        'Remetente': df_relatorio['Remetente'],
+        'normais': horas_extras.where(~fim_de_semana, 0.0),
+        'atipicas': horas_extras.where(fim_de_semana, 0.0),
+        'custo': df_relatorio['Custo Horas Extras'],
+        'noturno': df_relatorio['Adicional Noturno'],
+        'inconsistencias': observacoes.str.contains('incompleto', case=False, na=False),
+        'atipicos': observacoes.str.contains('atípico', case=False, na=False),
+    }).groupby('Remetente', observed=True).sum()
+    semanais = total_semanal_df.groupby('Remetente', observed=True)['horas_extras_semanais'].sum()
+
+    return pd.DataFrame({
+        "Total de Horas Extras": arredondar(totais['normais'] + totais['atipicas']),
+        "Horas Extras Normais": arredondar(totais['normais']),
+        "Horas Extras Atípicas": arredondar(totais['atipicas']),
+        "Horas Extras Semanais (Total)": arredondar(semanais.reindex(totais.index, fill_value=0.0)),
+        "Custo Total de Horas Extras": arredondar(totais['custo']),
+        "Adicional Noturno": arredondar(totais['noturno']),
+        "Inconsistencias": totais['inconsistencias'].astype(int),
+        "Acionamentos atípicos": totais['atipicos'].astype(int),
+    })
+
+
+def somar_resumos(df_resumo):
+    """Soma o resumo por remetente em um único resumo, no formato de resumir_relatorio."""
+    return {chave: int(coluna.sum()) if pd.api.types.is_integer_dtype(coluna) else round(float(coluna.sum()), 2)
+            for chave, coluna in df_resumo.items()}
+
+
+def extrair_mensagens(texto_completo, manter_conteudo=False, verificar_cancelamento=None):
+    """
+    Etapa de leitura: converte o texto do chat na tabela de mensagens, em
+    formato compacto: 'data_hora' (datetime64), 'remetente' (categórico) e
+    'midia'. O conteúdo só é guardado, na coluna 'conteudo', com
+    manter_conteudo=True. Mídias ocultas e mensagens apagadas são
+    descartadas já na varredura das linhas, então 'midia' é sempre falso
+    aqui (a coluna é mantida para as mensagens armazenadas). Com
+    'verificar_cancelamento', a função é chamada a cada bloco de linhas e a
+    exceção que ela levantar interrompe a leitura. Retorna
+    (df_mensagens, erro), com erro None em caso de sucesso.
+    """
+    datas_horas = []
+    datas_horas_midia = []
+    # Cada remetente é guardado uma única vez; as mensagens guardam apenas o código
+    codigos_remetentes = {}
+    codigos = []
+    conteudos = []
+    estatisticas = nova_estatistica()
+    df_mensagens = pd.DataFrame()
+
+    linhas = texto_completo.splitlines()
+    if verificar_cancelamento is not None:
+        linhas = _verificando_cancelamento(linhas, verificar_cancelamento)
+
+    with etapa("leitura_linhas") as registro:
+        # A conversão de data e hora é feita em lote, após a leitura de todas as linhas
+        for data_str, hora_str, remetente, conteudo, linha, midia in iterar_mensagens(linhas, estatisticas):
+            if midia:
+                # Das mídias, basta saber se havia alguma com data válida (ver o erro abaixo)
+                datas_horas_midia.append(f"{data_str} {hora_str}")
+                continue
+            datas_horas.append(f"{data_str} {hora_str}")
+            codigos.append(codigos_remetentes.setdefault(remetente, len(codigos_remetentes)))
+            if manter_conteudo:
+                conteudos.append(conteudo)
+
+        if datas_horas:
+            data_hora = converter_datas_horas(datas_horas).to_numpy()
+            validas = ~np.isnat(data_hora)
+
+            # As linhas originais não são guardadas (seriam uma segunda cópia do texto): o exemplo
+            # de linha ignorada é a data e a hora que não puderam ser convertidas
+            for indice in np.flatnonzero(~validas):
+                _ignorar_linha(estatisticas, datas_horas[indice])
+
+            colunas = {
+                'data_hora': data_hora[validas],
+                'remetente': pd.Categorical.from_codes(np.asarray(codigos, dtype=np.int32)[validas],
+                                                       categories=list(codigos_remetentes)),
+                'midia': np.zeros(int(validas.sum()), dtype=bool),
+            }
+            if manter_conteudo:
+                colunas['conteudo'] = np.asarray(conteudos, dtype=object)[validas]
+            df_mensagens = pd.DataFrame(colunas)
+
+        registro.update(linhas=estatisticas['linhas'], linhas_ignoradas=estatisticas['linhas_ignoradas'],
+                        mensagens=len(df_mensagens), mensagens_midia=len(datas_horas_midia),
+                        remetentes=len(codigos_remetentes))
+
+    _avisar_linhas_ignoradas(estatisticas)
+
+    if df_mensagens.empty:
+        if datas_horas_midia and converter_datas_horas(datas_horas_midia).notna().any():
+            return pd.DataFrame(), ERRO_SEM_MENSAGENS_VALIDAS
+        return pd.DataFrame(), ERRO_SEM_REGISTROS
+
+    return df_mensagens, None
+
+
+def dias_de_mensagens(df_mensagens):
+    """
+    Descarta as mensagens de mídia (presentes nas mensagens armazenadas) e
+    agrega as demais na tabela de entrada/saída por dia. Retorna (df_dias, erro).
+    """
+    df_validas = df_mensagens[~df_mensagens['midia']]
+
+    if df_validas.empty:
+        return pd.DataFrame(), ERRO_SEM_MENSAGENS_VALIDAS
+
+    # Entrada e saída de cada dia em uma única agregação
+    with etapa("agregacao_diaria", mensagens=len(df_validas)) as registro:
+        df_dias = agregar_dias(df_validas)
+        registro['dias'] = len(df_dias)
+
+    return df_dias, None
+
+
+def extrair_dias(texto_completo, verificar_cancelamento=None):
+    """
+    Etapa de leitura e normalização: converte o texto do chat na tabela de
+    entrada/saída por dia. Não depende dos parâmetros de cálculo, então o
+    resultado pode ser reaproveitado entre mudanças de salário, jornada ou
+    horários. Retorna (df_dias, erro), com erro None em caso de sucesso.
+    """
+    df_mensagens, erro = extrair_mensagens(texto_completo, verificar_cancelamento=verificar_cancelamento)
+    if erro:
+        return pd.DataFrame(), erro
+    return dias_de_mensagens(df_mensagens)
+
+
+def filtrar_remetentes(df_mensagens, remetentes):
+    """Mantém apenas as mensagens dos 'remetentes' informados (todas, se vazio). Retorna (df_mensagens, erro)."""
+    if not remetentes:
+        return df_mensagens, None
+    df_mensagens = df_mensagens[df_mensagens['remetente'].isin([nome.strip() for nome in remetentes])]
+    if df_mensagens.empty:
+        return df_mensagens, ERRO_SEM_REMETENTES
+    return df_mensagens, None
+
+
+def extrair_dias_por_remetente(texto_completo, remetentes=None, verificar_cancelamento=None):
+    """
+    Como extrair_dias, mas com a entrada e a saída de cada remetente em
+    cada dia. Com 'remetentes', apenas as mensagens dessas pessoas são
+    consideradas. Retorna (df_dias_remetentes, erro).
+    """
+    df_mensagens, erro = extrair_mensagens(texto_completo, verificar_cancelamento=verificar_cancelamento)
+    if erro:
+        return pd.DataFrame(), erro
+
+    df_mensagens, erro = filtrar_remetentes(df_mensagens, remetentes)
+    if erro:
+        return pd.DataFrame(), erro
+
+    with etapa("agregacao_diaria", mensagens=len(df_mensagens)) as registro:
+        df_dias_remetentes = agregar_dias_por_remetente(df_mensagens)
+        registro.update(dias=len(df_dias_remetentes), remetentes=df_dias_remetentes['remetente'].nunique())
+
+    return df_dias_remetentes, None
+
+
+def extrair_dias_stream(linhas):
+    """
+    Versão em fluxo de extrair_dias: consome um iterável de linhas (ou um
+    arquivo aberto) sem carregar o texto inteiro. Dias repetidos fora de
+    ordem são mesclados.
+    """
+    estatisticas = nova_estatistica()
+
+    # Em fluxo, leitura, classificação e agregação acontecem juntas, linha a linha
+    with etapa("leitura_linhas") as registro:
+        df_dias = pd.DataFrame(iterar_dias(linhas, estatisticas), columns=['data', 'entrada', 'saida'])
+        registro.update(linhas=estatisticas['linhas'], linhas_ignoradas=estatisticas['linhas_ignoradas'],
+                        dias=len(df_dias))
+
+    _avisar_linhas_ignoradas(estatisticas)
+
+    if df_dias.empty:
+        if estatisticas['midia_valida']:
+            return pd.DataFrame(), ERRO_SEM_MENSAGENS_VALIDAS
+        return pd.DataFrame(), ERRO_SEM_REGISTROS
+
+    # Mescla dias que reaparecem fora de ordem no fluxo
+    df_dias = df_dias.groupby('data', sort=True).agg(entrada=('entrada', 'min'), saida=('saida', 'max')).reset_index()
+    df_dias['data'] = pd.to_datetime(df_dias['data'])
+    return df_dias, None
+
+
+def analise_jornada_trabalho(texto_completo, jornada_diaria, carga_horaria_semanal, tempo_intervalo,
+                             salario_bruto, horario_inicio_str, horario_fim_str):
+    """
+    Analisa um texto de chat para gerar um relatório de trabalho,
+    incluindo cálculos de horas extras e adicionais com base na CLT.
+    """
+    df_dias, erro = extrair_dias(texto_completo)
+    if erro:
+        return pd.DataFrame(), {"erro": erro}
+
+    with etapa("resumo", dias=len(df_dias)):
+        return calcular_relatorio(df_dias, jornada_diaria, carga_horaria_semanal, tempo_intervalo,
+                                  salario_bruto, horario_inicio_str, horario_fim_str)
+
+
+def analise_jornada_trabalho_stream(linhas, jornada_diaria, carga_horaria_semanal, tempo_intervalo,
+                                    salario_bruto, horario_inicio_str, horario_fim_str):
+    """
+    Versão em fluxo de analise_jornada_trabalho: consome um iterável de
+    linhas (ou um arquivo aberto) sem carregar o texto inteiro, mantendo
+    apenas a entrada/saída de cada dia.
+    """
+    df_dias, erro = extrair_dias_stream(linhas)
+    if erro:
+        return pd.DataFrame(), {"erro": erro}
+
+    with etapa("resumo", dias=len(df_dias)):
+        return calcular_relatorio(df_dias, jornada_diaria, carga_horaria_semanal, tempo_intervalo,
+                                  salario_bruto, horario_inicio_str, horario_fim_str)
+
+
+def analise_jornada_trabalho_por_remetente(texto_completo, jornada_diaria, carga_horaria_semanal, tempo_intervalo,
+                                           salario_bruto, horario_inicio_str, horario_fim_str, remetentes=None):
+    """
+    Analisa a jornada de cada pessoa do chat separadamente (ex.: grupos da
+    equipe), opcionalmente apenas dos 'remetentes' informados. Retorna o
+    relatório de todos, com a coluna 'Remetente', e o resumo por remetente.
+    """
+    df_dias_remetentes, erro = extrair_dias_por_remetente(texto_completo, remetentes)
+    if erro:
+        return pd.DataFrame(), {"erro": erro}
+
+    with etapa("resumo", dias=len(df_dias_remetentes)):
+        return calcular_relatorio_por_remetente(df_dias_remetentes, jornada_diaria, carga_horaria_semanal,
+                                                tempo_intervalo, salario_bruto, horario_inicio_str, horario_fim_str)
@@ -1,75 +1,298 @@
 import streamlit as st
 import pandas as pd
-import io
+import importlib
+import importlib.util
+from contextlib import contextmanager
 from datetime import datetime
-from analise_jornada_trabalho import analise_jornada_trabalho
-from leitor_docx import ler_docx
-from leitor_pdf import ler_pdf
-from leitor_ocr import ler_imagem
-
-# Tenta importar openpyxl para exportação
-try:
-    from openpyxl import load_workbook
-    from openpyxl.utils.dataframe import dataframe_to_rows
-except ImportError:
+from analise_jornada_trabalho import (extrair_dias, extrair_dias_por_remetente, extrair_mensagens, calcular_relatorio,
+                                      calcular_relatorio_por_remetente, filtrar_remetentes, somar_resumos)
+from jornada_sessoes import calcular_relatorio_sessoes
+from cache_resultados import cache_textos, cache_dias, cache_analises, hash_bytes, chave_analise
+from instrumentacao import Diagnostico, etapa
+from fila_tarefas import fila_analises, CONCLUIDA, CANCELADA, ERRO
+from filtros_relatorio import COLUNA_REMETENTE, preparar_filtros, filtrar_relatorio
+
+# Verifica se o openpyxl está instalado sem importá-lo: a exportação (e os leitores de
+# arquivos) só são importados no primeiro uso, para o app iniciar mais rápido
+EXCEL_DISPONIVEL = importlib.util.find_spec("openpyxl") is not None
+if not EXCEL_DISPONIVEL:
     st.warning("Módulo 'openpyxl' não encontrado. A exportação para Excel não funcionará. "
                "Instale-o com `pip install openpyxl`.")
 
 
 def to_excel(df, resumo):
     """Cria um arquivo Excel em memória com duas abas: Resumo e Detalhado."""
+    if not EXCEL_DISPONIVEL:
+        return None
     try:
-        # Tenta carregar o modelo. Se não encontrar, cria um novo
-        try:
-            workbook = load_workbook(filename='modelo_relatorio.xlsx')
-        except FileNotFoundError:
-            st.error("Arquivo 'modelo_relatorio.xlsx' não encontrado. O download será de um arquivo simples.")
-            df_resumo = pd.DataFrame(resumo.items(), columns=['Métrica', 'Valor'])
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                df_resumo.to_excel(writer, sheet_name='Resumo da Análise', index=False)
-                df.to_excel(writer, sheet_name='Análise Detalhada', index=False)
-            buffer.seek(0)
-            return buffer
-
-        # Cria um buffer em memória
-        buffer = io.BytesIO()
-        workbook.save(buffer)
-
-        # Carrega o buffer em um workbook
-        workbook = load_workbook(buffer)
-
-        # Preencher a aba 'Resumo da Análise'
-        worksheet_resumo = workbook['Resumo da Análise']
-        for row in worksheet_resumo.iter_rows(min_row=2, max_row=worksheet_resumo.max_row):
-            for cell in row:
-                cell.value = None
-
-        df_resumo = pd.DataFrame(resumo.items(), columns=['Métrica', 'Valor'])
-        for r_idx, row in enumerate(dataframe_to_rows(df_resumo, index=False, header=False), 2):
-            for c_idx, value in enumerate(row, 1):
-                worksheet_resumo.cell(row=r_idx, column=c_idx, value=value)
-
-        # Preencher a aba 'Análise Detalhada'
-        worksheet_detalhada = workbook['Análise Detalhada']
-        for row in worksheet_detalhada.iter_rows(min_row=2, max_row=worksheet_detalhada.max_row):
-            for cell in row:
-                cell.value = None
-
-        for r_idx, row in enumerate(dataframe_to_rows(df, index=False, header=False), 2):
-            for c_idx, value in enumerate(row, 1):
-                worksheet_detalhada.cell(row=r_idx, column=c_idx, value=value)
-
-        buffer_final = io.BytesIO()
-        workbook.save(buffer_final)
-        buffer_final.seek(0)
-        return buffer_final
-
+        from exportacao_excel import gerar_excel
+        with diagnostico(), etapa("exportacao_excel", linhas=len(df)):
+            return gerar_excel(df, resumo)
     except Exception as e:
         st.error(f"Erro ao gerar o arquivo Excel: {e}")
         return None
 
 
+def extrair_texto_upload(conteudo, extensao, verificar_cancelamento=None):
+    """
+    Extrai o texto de um arquivo enviado, conforme a extensão. Falhas de
+    leitura levantam exceção em vez de virar texto, para que não fiquem
+    guardadas no cache de textos (ex.: Tesseract ausente na primeira vez).
+    No OCR, 'verificar_cancelamento' é chamada antes de cada imagem.
+    """
+    if extensao == 'pdf':
+        from leitor_pdf import iterar_paginas_pdf
+        return "\n".join(iterar_paginas_pdf(conteudo))
+    elif extensao == 'docx':
+        from leitor_docx import iterar_linhas_docx
+        return "\n".join(iterar_linhas_docx(conteudo))
+    elif extensao in EXTENSOES_IMAGEM or extensao == EXTENSAO_VARIAS_IMAGENS:
+        # Várias imagens (ex.: fotos de cada página da folha de ponto) passam juntas pelo OCR, em paralelo
+        from leitor_ocr import ler_imagens
+        resultados = ler_imagens(conteudo if extensao == EXTENSAO_VARIAS_IMAGENS else [conteudo],
+                                 verificar_cancelamento=verificar_cancelamento)
+        for resultado in resultados:
+            if resultado['erro']:
+                raise RuntimeError(f"Erro ao ler imagem: {resultado['erro']}")
+        return "\n".join(resultado['texto'] for resultado in resultados)
+    elif extensao == 'txt':
+        return conteudo.decode("utf-8")
+    return None
+
+
+EXTENSOES_IMAGEM = ['png', 'jpg', 'jpeg', 'tif', 'tiff']
+
+# "Extensão" de um envio com várias imagens, cujo conteúdo é a tupla com os bytes de cada uma
+EXTENSAO_VARIAS_IMAGENS = 'imagens'
+
+# Arquivos cuja extração (PDF/OCR) pode demorar são processados em segundo plano
+EXTENSOES_SEGUNDO_PLANO = ['pdf', *EXTENSOES_IMAGEM, EXTENSAO_VARIAS_IMAGENS]
+
+# Módulo leitor de cada extensão, importado apenas quando um arquivo desse tipo é enviado
+MODULOS_LEITORES = {'pdf': 'leitor_pdf', 'docx': 'leitor_docx', EXTENSAO_VARIAS_IMAGENS: 'leitor_ocr',
+                    **{extensao: 'leitor_ocr' for extensao in EXTENSOES_IMAGEM}}
+
+
+def chave_texto_upload(conteudo, extensao):
+    """Chave do texto extraído de um envio: o hash do conteúdo (ou de cada imagem) e a extensão."""
+    if extensao == EXTENSAO_VARIAS_IMAGENS:
+        return f"{hash_bytes('|'.join(hash_bytes(imagem) for imagem in conteudo))}.{extensao}"
+    return f"{hash_bytes(conteudo)}.{extensao}"
+
+
+def tamanho_upload(conteudo, extensao):
+    """Tamanho em bytes de um envio (somando as imagens, se forem várias)."""
+    if extensao == EXTENSAO_VARIAS_IMAGENS:
+        return sum(len(imagem) for imagem in conteudo)
+    return len(conteudo)
+
+ROTULOS_ESTADO = {
+    "na_fila": "⏳ Na fila",
+    "executando": "⚙️ Em execução",
+    CONCLUIDA: "✅ Concluída",
+    CANCELADA: "🚫 Cancelada",
+    ERRO: "❌ Erro",
+}
+
+
+@contextmanager
+def diagnostico():
+    """Mede as etapas executadas no bloco e guarda a última medição de cada uma na sessão."""
+    with Diagnostico(medir_memoria=st.session_state.get('medir_memoria', False), emitir_logs=True) as coletor:
+        try:
+            yield coletor
+        finally:
+            for registro in coletor.etapas:
+                st.session_state.diagnostico[registro['etapa']] = registro
+
+
+def calcular_analise(texto, parametros, remetentes=None, inatividade=None, verificar_cancelamento=None):
+    """
+    Executa a análise em duas etapas: a leitura do texto (tabela de dias),
+    em cache pelo hash do texto, e o cálculo, refeito para cada conjunto
+    de parâmetros. Com 'remetentes' (tupla, vazia para todos), a análise
+    é feita separadamente para cada remetente; com 'inatividade' (horas de
+    pausa que encerram uma sessão, 0 para nenhuma), por sessões de trabalho
+    em vez de dias. Não usa o estado da sessão,
+    então também pode ser executada em segundo plano, com
+    'verificar_cancelamento' chamada durante a leitura das linhas.
+    """
+    def calcular():
+        if inatividade is not None:
+            df_mensagens, erro = cache_dias.obter_ou_calcular(
+                chave_analise(texto, 'mensagens'),
+                lambda: extrair_mensagens(texto, verificar_cancelamento=verificar_cancelamento))
+            if not erro:
+                df_mensagens, erro = filtrar_remetentes(df_mensagens, remetentes)
+            if erro:
+                return pd.DataFrame(), {"erro": erro}
+            return calcular_relatorio_sessoes(df_mensagens, *parametros, intervalo_inatividade=inatividade or None,
+                                              por_remetente=remetentes is not None)
+        if remetentes is None:
+            df_dias, erro = cache_dias.obter_ou_calcular(hash_bytes(texto),
+                                                         lambda: extrair_dias(texto, verificar_cancelamento))
+            calculo = calcular_relatorio
+        else:
+            df_dias, erro = cache_dias.obter_ou_calcular(
+                chave_analise(texto, 'por_remetente', *remetentes),
+                lambda: extrair_dias_por_remetente(texto, remetentes, verificar_cancelamento))
+            calculo = calcular_relatorio_por_remetente
+        if erro:
+            return pd.DataFrame(), {"erro": erro}
+        with etapa("resumo", dias=len(df_dias)):
+            return calculo(df_dias, *parametros)
+
+    return cache_analises.obter_ou_calcular(chave_analise(texto, *parametros, remetentes, inatividade), calcular)
+
+
+def analisar(texto, parametros, remetentes=None, inatividade=None):
+    """Executa calcular_analise registrando as etapas no diagnóstico da sessão."""
+    with diagnostico():
+        return calcular_analise(texto, parametros, remetentes, inatividade)
+
+
+def registrar_resultado(texto, parametros, remetentes, inatividade, df_analise, resumo):
+    """Guarda o resultado de uma análise no estado da sessão."""
+    if isinstance(resumo, dict) and "erro" in resumo:
+        st.error(resumo["erro"])
+        st.session_state.df_analise = None
+        return False
+    # Na análise por remetente, as métricas mostram a soma e a tabela, o resumo de cada pessoa
+    st.session_state.resumo_por_remetente = None
+    if isinstance(resumo, pd.DataFrame):
+        st.session_state.resumo_por_remetente = resumo
+        resumo = somar_resumos(resumo)
+    st.session_state.df_analise, st.session_state.resumo_analise = df_analise, resumo
+    # O relatório não é mais alterado pelos filtros; as colunas de filtro são calculadas uma vez por análise
+    st.session_state.df_analise_completo = df_analise
+    st.session_state.filtros_analise = preparar_filtros(df_analise)
+    st.session_state.texto_analisado = texto
+    st.session_state.parametros_analise = (parametros, remetentes, inatividade)
+    st.session_state.excel_relatorio = None
+    return True
+
+
+def atualizar_analise(texto, parametros, remetentes=None, inatividade=None):
+    """Executa a análise e guarda o resultado no estado da sessão."""
+    df_analise, resumo = analisar(texto, parametros, remetentes, inatividade)
+    return registrar_resultado(texto, parametros, remetentes, inatividade, df_analise, resumo)
+
+
+def extrair_texto_tarefa(tarefa, conteudo, extensao):
+    """
+    Extrai o texto de um arquivo em segundo plano, informando as páginas
+    lidas do PDF e interrompendo a leitura (por página ou imagem) se a
+    tarefa for cancelada.
+    """
+    if extensao != 'pdf':
+        return extrair_texto_upload(conteudo, extensao, tarefa.verificar_cancelamento)
+    from leitor_pdf import iterar_paginas_pdf
+    paginas = []
+    for texto_pagina in iterar_paginas_pdf(conteudo):
+        paginas.append(texto_pagina)
+        tarefa.atualizar(paginas=len(paginas))
+        tarefa.verificar_cancelamento()
+    return "\n".join(paginas)
+
+
+def importar_dependencias_tarefa(extensao):
+    """
+    Importa, na thread do script, os módulos que a tarefa usará: o
+    Streamlit só inclui a pasta do app no sys.path durante a execução do
+    script, então a importação sob demanda falharia na thread da tarefa.
+    """
+    if extensao in MODULOS_LEITORES:
+        importlib.import_module(MODULOS_LEITORES[extensao])
+    if EXCEL_DISPONIVEL:
+        importlib.import_module('exportacao_excel')
+
+
+def tarefa_analise(tarefa, conteudo, extensao, parametros, remetentes, inatividade):
+    """
+    Tarefa em segundo plano: extrai o texto do arquivo, calcula a análise
+    e gera o Excel. As contagens de cada etapa (páginas, linhas, dias)
+    são publicadas como progresso da tarefa.
+    """
+    def publicar(registro):
+        tarefa.atualizar(**{chave: valor for chave, valor in registro.items()
+                            if chave not in ('etapa', 'segundos', 'pico_memoria_mb')})
+
+    with Diagnostico(emitir_logs=True, ao_registrar=publicar) as coletor:
+        tarefa.atualizar(etapa="extração do texto")
+        chave_texto = chave_texto_upload(conteudo, extensao)
+        with etapa("extracao", bytes=tamanho_upload(conteudo, extensao), cache=chave_texto in cache_textos) as registro:
+            texto = cache_textos.obter_ou_calcular(chave_texto,
+                                                   lambda: extrair_texto_tarefa(tarefa, conteudo, extensao))
+            registro['caracteres'] = len(texto) if texto else 0
+        if texto is None:
+            raise ValueError("Tipo de arquivo não suportado.")
+
+        tarefa.verificar_cancelamento()
+        tarefa.atualizar(etapa="análise")
+        df_analise, resumo = calcular_analise(texto, parametros, remetentes, inatividade,
+                                              tarefa.verificar_cancelamento)
+
+        excel = None
+        if EXCEL_DISPONIVEL and not (isinstance(resumo, dict) and "erro" in resumo):
+            from exportacao_excel import gerar_excel
+            tarefa.verificar_cancelamento()
+            tarefa.atualizar(etapa="exportação para Excel")
+            resumo_geral = somar_resumos(resumo) if isinstance(resumo, pd.DataFrame) else resumo
+            with etapa("exportacao_excel", linhas=len(df_analise)):
+                excel = gerar_excel(df_analise, resumo_geral).getvalue()
+
+    return {
+        'texto': texto,
+        'parametros': parametros,
+        'remetentes': remetentes,
+        'inatividade': inatividade,
+        'df_analise': df_analise,
+        'resumo': resumo,
+        'excel': excel,
+        'etapas': coletor.etapas,
+    }
+
+
+def entregar_tarefas():
+    """Carrega na sessão o resultado das tarefas desta sessão que terminaram desde o último rerun."""
+    for id_tarefa in st.session_state.tarefas:
+        tarefa = fila_analises.obter(id_tarefa)
+        if tarefa is None or not tarefa.encerrada or id_tarefa in st.session_state.tarefas_entregues:
+            continue
+        st.session_state.tarefas_entregues.add(id_tarefa)
+        if tarefa.estado == CONCLUIDA:
+            resultado = tarefa.resultado
+            for registro in resultado['etapas']:
+                st.session_state.diagnostico[registro['etapa']] = registro
+            if registrar_resultado(resultado['texto'], resultado['parametros'], resultado['remetentes'],
+                                   resultado['inatividade'], resultado['df_analise'], resultado['resumo']):
+                st.session_state.excel_relatorio = resultado['excel']
+                st.success(f"Análise de {tarefa.descricao} concluída com sucesso!")
+        elif tarefa.estado == ERRO:
+            st.error(f"Erro ao processar {tarefa.descricao}: {tarefa.erro}")
+
+
+def painel_tarefas():
+    """Lista as tarefas da sessão com o progresso e a opção de cancelar."""
+    tarefas = [tarefa for tarefa in map(fila_analises.obter, st.session_state.tarefas) if tarefa is not None]
+    if not tarefas:
+        return
+    st.subheader("Tarefas em Segundo Plano")
+    for tarefa in reversed(tarefas):
+        col_tarefa1, col_tarefa2 = st.columns([5, 1])
+        with col_tarefa1:
+            progresso = ", ".join(f"{chave}: {valor}" for chave, valor in tarefa.progresso.items())
+            st.markdown(f"**{tarefa.descricao}** — {ROTULOS_ESTADO[tarefa.estado]} ({tarefa.segundos:.0f}s)")
+            if progresso and not tarefa.encerrada:
+                st.caption(progresso)
+        with col_tarefa2:
+            if not tarefa.encerrada and st.button("Cancelar", key=f"cancelar_{tarefa.id}"):
+                tarefa.cancelar()
+    # Quando uma tarefa termina, o app inteiro é recarregado para exibir o resultado
+    if any(tarefa.encerrada and tarefa.id not in st.session_state.tarefas_entregues for tarefa in tarefas):
+        st.rerun()
+
+
 # Variáveis de estado do Streamlit para manter os dados
 if 'df_analise' not in st.session_state:
     st.session_state.df_analise = None
@@ -77,6 +300,22 @@ if 'df_analise_completo' not in st.session_state:
     st.session_state.df_analise_completo = None
 if 'resumo_analise' not in st.session_state:
     st.session_state.resumo_analise = None
+if 'excel_relatorio' not in st.session_state:
+    st.session_state.excel_relatorio = None
+if 'parametros_analise' not in st.session_state:
+    st.session_state.parametros_analise = None
+if 'resumo_por_remetente' not in st.session_state:
+    st.session_state.resumo_por_remetente = None
+if 'filtros_analise' not in st.session_state:
+    st.session_state.filtros_analise = None
+if 'tarefas' not in st.session_state:
+    st.session_state.tarefas = []
+if 'tarefas_entregues' not in st.session_state:
+    st.session_state.tarefas_entregues = set()
+if 'arquivo_pendente' not in st.session_state:
+    st.session_state.arquivo_pendente = None
+if 'diagnostico' not in st.session_state:
+    st.session_state.diagnostico = {}
 
 # --- UI e Lógica do App ---
 st.set_page_config(
@@ -111,29 +350,53 @@ st.subheader("Entrada de Dados")
 tab1, tab2 = st.tabs(["Carregar Arquivo", "Entrada Manual"])
 
 with tab1:
-    uploaded_file = st.file_uploader(
+    uploaded_files = st.file_uploader(
         "Selecione um arquivo de registros de ponto",
-        type=['txt', 'docx', 'pdf', 'png', 'jpg', 'jpeg'],
-        help="O arquivo deve conter os registros de ponto para análise."
+        type=['txt', 'docx', 'pdf', *EXTENSOES_IMAGEM],
+        accept_multiple_files=True,
+        help="O arquivo deve conter os registros de ponto para análise. Várias imagens (ex.: uma foto "
+             "por página da folha de ponto) podem ser enviadas juntas e são analisadas como um só registro."
     )
-    if uploaded_file:
-        with st.spinner(f'Analisando o arquivo {uploaded_file.name}...'):
-            file_extension = uploaded_file.name.split('.')[-1]
-            try:
-                if file_extension == 'pdf':
-                    st.session_state.texto_registros = ler_pdf(io.BytesIO(uploaded_file.getvalue()))
-                elif file_extension == 'docx':
-                    st.session_state.texto_registros = ler_docx(io.BytesIO(uploaded_file.getvalue()))
-                elif file_extension in ['png', 'jpg', 'jpeg']:
-                    st.session_state.texto_registros = ler_imagem(uploaded_file)
-                elif file_extension == 'txt':
-                    st.session_state.texto_registros = uploaded_file.getvalue().decode("utf-8")
-                else:
+    st.session_state.arquivo_pendente = None
+    conteudo = None
+    extensoes = [arquivo.name.split('.')[-1].lower() for arquivo in uploaded_files]
+    if len(uploaded_files) == 1:
+        file_extension = extensoes[0]
+        nome_envio = uploaded_files[0].name
+        conteudo = uploaded_files[0].getvalue()
+    elif uploaded_files and all(extensao in EXTENSOES_IMAGEM for extensao in extensoes):
+        file_extension = EXTENSAO_VARIAS_IMAGENS
+        nome_envio = f"{len(uploaded_files)} imagens"
+        conteudo = tuple(arquivo.getvalue() for arquivo in uploaded_files)
+    elif uploaded_files:
+        st.error("Apenas imagens podem ser enviadas em conjunto; envie os demais arquivos um de cada vez.")
+    if conteudo is not None:
+        chave_texto = chave_texto_upload(conteudo, file_extension)
+        if file_extension in EXTENSOES_SEGUNDO_PLANO and chave_texto not in cache_textos:
+            # PDFs e imagens ainda não extraídos são lidos em segundo plano ao calcular
+            st.session_state.arquivo_pendente = {
+                'nome': nome_envio, 'conteudo': conteudo, 'extensao': file_extension, 'chave': chave_texto}
+            st.info(f"{nome_envio}: a leitura será feita em segundo plano ao clicar em \"Calcular Jornada\".")
+        else:
+            with st.spinner(f'Analisando o arquivo {nome_envio}...'):
+                try:
+                    with diagnostico(), etapa("extracao", arquivo=nome_envio,
+                                              bytes=tamanho_upload(conteudo, file_extension),
+                                              cache=chave_texto in cache_textos) as registro:
+                        # A extração (PDF/OCR) é feita uma única vez por conteúdo de arquivo
+                        texto = cache_textos.obter_ou_calcular(
+                            chave_texto,
+                            lambda: extrair_texto_upload(conteudo, file_extension)
+                        )
+                        registro['caracteres'] = len(texto) if texto else 0
+                    if texto is None:
+                        st.session_state.texto_registros = ""
+                        st.error("Tipo de arquivo não suportado.")
+                    else:
+                        st.session_state.texto_registros = texto
+                except Exception as e:
                     st.session_state.texto_registros = ""
-                    st.error("Tipo de arquivo não suportado.")
-            except Exception as e:
-                st.session_state.texto_registros = ""
-                st.error(f"Erro ao processar o arquivo: {e}")
+                    st.error(f"Erro ao processar o arquivo: {e}")
 
 with tab2:
     st.session_state.texto_registros = st.text_area(
@@ -145,25 +408,69 @@ with tab2:
         st.session_state.texto_registros = ""
         st.rerun()
 
+parametros = (jornada_diaria, jornada_semanal, intervalo, salario, horario_inicio, horario_fim)
+
+# Em grupos da equipe, a jornada pode ser calculada separadamente para cada remetente
+col_remetente1, col_remetente2 = st.columns([1, 3])
+with col_remetente1:
+    por_remetente = st.checkbox("Analisar por remetente",
+                                help="Calcula a entrada e a saída de cada pessoa do chat separadamente.")
+with col_remetente2:
+    lista_remetentes = st.text_input("Remetentes (opcional, separados por vírgula)", disabled=not por_remetente,
+                                     help="Deixe em branco para analisar todos os remetentes.")
+remetentes = None
+if por_remetente:
+    remetentes = tuple(nome.strip() for nome in lista_remetentes.split(",") if nome.strip())
+
+# Plantões e turnos noturnos: a jornada é contada por sessão de trabalho, que pode atravessar a meia-noite
+col_sessao1, col_sessao2 = st.columns([1, 3])
+with col_sessao1:
+    por_sessao = st.checkbox("Turnos que atravessam a meia-noite",
+                             help="Conta a jornada por dia de trabalho, que vira no descanso entre os turnos "
+                                  "(visto nas mensagens) em vez da meia-noite. Para plantões noturnos, informe "
+                                  "acima o horário do turno. O adicional noturno considera as horas entre 22h e 5h.")
+with col_sessao2:
+    pausa_sessao = st.number_input("Pausa que encerra uma sessão (h, 0 para nenhuma)", min_value=0.0, value=0.0,
+                                   disabled=not por_sessao,
+                                   help="Divide o dia de trabalho em duas sessões quando não há mensagens por "
+                                        "mais tempo que isso (ex.: dois turnos no mesmo dia).")
+inatividade = pausa_sessao if por_sessao else None
+
+entregar_tarefas()
+
 if st.button("Calcular Jornada", type="primary", use_container_width=True):
-    if not st.session_state.texto_registros:
+    if st.session_state.arquivo_pendente:
+        arquivo = st.session_state.arquivo_pendente
+        importar_dependencias_tarefa(arquivo['extensao'])
+        # Mesmo arquivo e parâmetros já na fila ou concluídos (por qualquer sessão) não são refeitos
+        tarefa = fila_analises.enviar(
+            chave_analise(arquivo['chave'], *parametros, remetentes, inatividade),
+            arquivo['nome'], tarefa_analise, arquivo['conteudo'], arquivo['extensao'], parametros, remetentes,
+            inatividade)
+        if tarefa.id not in st.session_state.tarefas:
+            st.session_state.tarefas.append(tarefa.id)
+        st.session_state.tarefas_entregues.discard(tarefa.id)
+    elif not st.session_state.texto_registros:
         st.error("Por favor, insira os registros de ponto ou carregue um arquivo.")
     else:
         with st.spinner('Realizando os cálculos...'):
             try:
-                st.session_state.df_analise, st.session_state.resumo_analise = analise_jornada_trabalho(
-                    st.session_state.texto_registros,
-                    jornada_diaria,
-                    jornada_semanal,
-                    intervalo,
-                    salario,
-                    horario_inicio,
-                    horario_fim
-                )
-                st.session_state.df_analise_completo = st.session_state.df_analise.copy()
-                st.success("Análise concluída com sucesso!")
+                if atualizar_analise(st.session_state.texto_registros, parametros, remetentes, inatividade):
+                    st.success("Análise concluída com sucesso!")
             except Exception as e:
                 st.error(f"Erro no cálculo: {e}")
+elif (st.session_state.df_analise is not None
+      and st.session_state.parametros_analise != (parametros, remetentes, inatividade)):
+    # Apenas os parâmetros mudaram: refaz só a etapa de cálculo sobre a tabela de dias em cache
+    try:
+        atualizar_analise(st.session_state.texto_analisado, parametros, remetentes, inatividade)
+    except Exception as e:
+        st.error(f"Erro no cálculo: {e}")
+
+# Acompanhamento das tarefas, atualizado a cada segundo enquanto alguma estiver em andamento
+tarefas_em_andamento = any(not tarefa.encerrada for tarefa in map(fila_analises.obter, st.session_state.tarefas)
+                           if tarefa is not None)
+st.fragment(painel_tarefas, run_every=1 if tarefas_em_andamento else None)()
 
 # --- Seção de Resultados ---
 if st.session_state.df_analise is not None:
@@ -180,15 +487,22 @@ if st.session_state.df_analise is not None:
                       f"R$ {st.session_state.resumo_analise['Custo Total de Horas Extras']:.2f}")
             st.metric("Adicional Noturno", f"R$ {st.session_state.resumo_analise['Adicional Noturno']:.2f}")
             st.metric("Inconsistências", st.session_state.resumo_analise['Inconsistencias'])
+    if st.session_state.resumo_por_remetente is not None:
+        st.dataframe(st.session_state.resumo_por_remetente, use_container_width=True)
 
     st.markdown("---")
     st.subheader("Relatório Detalhado")
 
     # Filtros
+    df_completo = st.session_state.df_analise_completo
+    flags = st.session_state.filtros_analise
     with st.expander("Filtros Avançados"):
         col_filtro1, col_filtro2, col_filtro3 = st.columns(3)
         with col_filtro1:
-            data_especifica = st.date_input("Data Específica", value=None)
+            periodo = st.date_input("Período", value=(), format="DD/MM/YYYY")
+            remetentes_filtro = []
+            if COLUNA_REMETENTE in df_completo.columns:
+                remetentes_filtro = st.multiselect("Remetentes", flags['remetente'].cat.categories.tolist())
         with col_filtro2:
             st.markdown("---")
             filtro_sabado = st.checkbox("Incluir Sábados")
@@ -198,33 +512,39 @@ if st.session_state.df_analise is not None:
             filtro_atipico = st.checkbox("Incluir Dias Atípicos")
             filtro_inconsistencia = st.checkbox("Incluir Inconsistências")
 
-    # Lógica de Filtragem
-    df_filtrado = st.session_state.df_analise_completo.copy()
-    if data_especifica:
-        df_filtrado['Data'] = pd.to_datetime(df_filtrado['Data'], dayfirst=True).dt.date
-        df_filtrado = df_filtrado[df_filtrado['Data'] == data_especifica]
-
-    if filtro_sabado:
-        df_filtrado = df_filtrado[df_filtrado['Dia da Semana'] == 'Sábado']
-
-    if filtro_domingo:
-        df_filtrado = df_filtrado[df_filtrado['Dia da Semana'] == 'Domingo']
-
-    if filtro_atipico:
-        df_filtrado = df_filtrado[df_filtrado['Observações'].str.contains('Atípico', case=False, na=False)]
-
-    if filtro_inconsistencia:
-        df_filtrado = df_filtrado[df_filtrado['Observações'].str.contains('Inconsistência', case=False, na=False)]
+    # Lógica de Filtragem: máscaras booleanas sobre as colunas pré-calculadas, sem copiar o relatório
+    dias_semana = [dia for dia, marcado in ((5, filtro_sabado), (6, filtro_domingo)) if marcado]
+    df_filtrado = filtrar_relatorio(
+        df_completo, flags,
+        inicio=periodo[0] if len(periodo) > 0 else None,
+        fim=periodo[-1] if len(periodo) > 0 else None,
+        dias_semana=dias_semana,
+        atipico=filtro_atipico,
+        inconsistencia=filtro_inconsistencia,
+        remetentes=remetentes_filtro,
+    )
 
     st.dataframe(df_filtrado, use_container_width=True)
 
-    # Botão de exportação
+    # Botão de exportação: o arquivo só é gerado quando solicitado, e reaproveitado nos reruns seguintes
     st.markdown("---")
-    excel_file = to_excel(st.session_state.df_analise_completo, st.session_state.resumo_analise)
-    if excel_file:
+    if st.session_state.excel_relatorio is None:
+        if st.button("📊 Gerar arquivo Excel"):
+            with st.spinner('Gerando o arquivo Excel...'):
+                excel_file = to_excel(st.session_state.df_analise_completo, st.session_state.resumo_analise)
+                st.session_state.excel_relatorio = excel_file.getvalue() if excel_file else None
+    if st.session_state.excel_relatorio:
         st.download_button(
             label="📥 Exportar para Excel",
-            data=excel_file,
+            data=st.session_state.excel_relatorio,
             file_name="relatorio_jornada.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
\ No newline at end of file
+        )
+
+# --- Diagnóstico de desempenho ---
+with st.expander("Diagnóstico"):
+    st.checkbox("Medir pico de memória (mais lento)", key='medir_memoria')
+    if st.session_state.diagnostico:
+        st.dataframe(pd.DataFrame(st.session_state.diagnostico.values()), use_container_width=True)
+    else:
+        st.caption("Nenhuma etapa medida ainda.")
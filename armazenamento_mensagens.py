@@ -0,0 +1,150 @@
+import argparse
+import logging
+import os
+from datetime import timedelta
+from pathlib import Path
+from urllib.parse import quote
+
+import pandas as pd
+
+from analise_jornada_trabalho import (ERRO_SEM_REGISTROS, calcular_relatorio, dias_de_mensagens,
+                                      extrair_mensagens)
+from instrumentacao import etapa
+
+# Tenta importar pyarrow para o armazenamento em Parquet
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    logging.warning(
+        "Módulo 'pyarrow' não encontrado. O armazenamento de mensagens em Parquet não estará disponível. "
+        "Por favor, instale-o com 'pip install pyarrow'.")
+
+# Colunas persistidas: o conteúdo das mensagens não é guardado, apenas o que a análise usa
+COLUNAS_ARMAZENADAS = ['data_hora', 'remetente', 'midia']
+
+NOME_ARQUIVO_PARTICAO = 'mensagens.parquet'
+
+
+def _exigir_pyarrow():
+    if pa is None:
+        raise ImportError("O armazenamento de mensagens requer o módulo 'pyarrow'.")
+
+
+def _particionamento():
+    # Esquema explícito: nomes numéricos de funcionário não devem virar inteiros
+    return ds.partitioning(pa.schema([('funcionario', pa.string()), ('mes', pa.string())]), flavor='hive')
+
+
+def _pasta_particao(diretorio, funcionario, mes):
+    return Path(diretorio) / f"funcionario={quote(str(funcionario), safe='')}" / f"mes={mes}"
+
+
+def salvar_mensagens(df_mensagens, diretorio, funcionario, substituir=False):
+    """
+    Grava as mensagens em Parquet, particionadas por funcionário e mês
+    (diretorio/funcionario=.../mes=AAAA-MM/). Apenas os meses presentes em
+    df_mensagens são tocados; com substituir=False, as mensagens são
+    mescladas às já armazenadas no mês, sem duplicatas. Retorna os meses gravados.
+    """
+    _exigir_pyarrow()
+    df = df_mensagens[COLUNAS_ARMAZENADAS]
+    meses = df['data_hora'].dt.strftime('%Y-%m')
+    gravados = []
+
+    for mes, df_mes in df.groupby(meses, sort=True):
+        pasta = _pasta_particao(diretorio, funcionario, mes)
+        caminho = pasta / NOME_ARQUIVO_PARTICAO
+        if caminho.exists() and not substituir:
+            df_mes = pd.concat([pd.read_parquet(caminho, columns=COLUNAS_ARMAZENADAS), df_mes]).drop_duplicates()
+
+        df_mes = df_mes.sort_values('data_hora').astype({'remetente': 'category'})
+        pasta.mkdir(parents=True, exist_ok=True)
+        # Grava em um arquivo oculto e troca de forma atômica; arquivos com '.' são ignorados na leitura
+        caminho_temporario = pasta / f".{NOME_ARQUIVO_PARTICAO}.{os.getpid()}.tmp"
+        pq.write_table(pa.Table.from_pandas(df_mes, preserve_index=False), caminho_temporario,
+                       compression='zstd')
+        os.replace(caminho_temporario, caminho)
+        gravados.append(mes)
+
+    return gravados
+
+
+def carregar_mensagens(diretorio, funcionario=None, inicio=None, fim=None):
+    """
+    Carrega as mensagens armazenadas, lendo apenas as partições do
+    funcionário e dos meses do intervalo [inicio, fim] (datas inclusivas).
+    """
+    _exigir_pyarrow()
+    if not Path(diretorio).exists():
+        return pd.DataFrame(columns=COLUNAS_ARMAZENADAS + ['funcionario'])
+
+    dataset = ds.dataset(diretorio, format='parquet', partitioning=_particionamento())
+    filtro = ds.field('mes').is_valid()
+    if funcionario is not None:
+        filtro &= ds.field('funcionario') == str(funcionario)
+    if inicio is not None:
+        inicio = pd.Timestamp(inicio).normalize()
+        filtro &= (ds.field('mes') >= inicio.strftime('%Y-%m')) & (ds.field('data_hora') >= inicio.to_pydatetime())
+    if fim is not None:
+        limite = pd.Timestamp(fim).normalize() + timedelta(days=1)
+        filtro &= (ds.field('mes') <= pd.Timestamp(fim).strftime('%Y-%m')) & \
+                  (ds.field('data_hora') < limite.to_pydatetime())
+
+    df = dataset.to_table(filter=filtro, columns=COLUNAS_ARMAZENADAS + ['funcionario']).to_pandas()
+    df['data_hora'] = df['data_hora'].astype('datetime64[ns]')
+    return df.sort_values('data_hora', kind='stable').reset_index(drop=True)
+
+
+def ingerir_texto(texto_completo, diretorio, funcionario, substituir=False):
+    """Lê um texto de chat e grava as mensagens no armazenamento. Retorna (meses, erro)."""
+    df_mensagens, erro = extrair_mensagens(texto_completo)
+    if erro:
+        return [], erro
+    with etapa("armazenamento", mensagens=len(df_mensagens)):
+        return salvar_mensagens(df_mensagens, diretorio, funcionario, substituir), None
+
+
+def analise_jornada_trabalho_armazenada(diretorio, funcionario, inicio, fim, jornada_diaria, carga_horaria_semanal,
+                                        tempo_intervalo, salario_bruto, horario_inicio_str, horario_fim_str):
+    """
+    Executa a análise direto sobre as mensagens armazenadas de um
+    funcionário, carregando apenas o período auditado.
+    """
+    with etapa("leitura_armazenamento") as registro:
+        df_mensagens = carregar_mensagens(diretorio, funcionario, inicio, fim)
+        registro['mensagens'] = len(df_mensagens)
+
+    if df_mensagens.empty:
+        return pd.DataFrame(), {"erro": ERRO_SEM_REGISTROS}
+
+    df_dias, erro = dias_de_mensagens(df_mensagens)
+    if erro:
+        return pd.DataFrame(), {"erro": erro}
+
+    with etapa("resumo", dias=len(df_dias)):
+        return calcular_relatorio(df_dias, jornada_diaria, carga_horaria_semanal, tempo_intervalo,
+                                  salario_bruto, horario_inicio_str, horario_fim_str)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Armazena mensagens de chat em Parquet, por funcionário e mês.")
+    parser.add_argument('arquivo', help="Exportação do chat (.txt) a ser armazenada.")
+    parser.add_argument('--funcionario', required=True)
+    parser.add_argument('--diretorio', default='armazenamento_mensagens', help="Diretório do armazenamento.")
+    parser.add_argument('--substituir', action='store_true', help="Substitui os meses presentes no arquivo.")
+    args = parser.parse_args(argv)
+
+    texto = Path(args.arquivo).read_text(encoding='utf-8', errors='replace')
+    meses, erro = ingerir_texto(texto, args.diretorio, args.funcionario, args.substituir)
+    if erro:
+        logging.warning(erro)
+        return 1
+    logging.info(f"{len(meses)} meses gravados para {args.funcionario}: {', '.join(meses)}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
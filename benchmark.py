@@ -0,0 +1,375 @@
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import zipfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from analise_jornada_trabalho import (agregar_dias, analise_jornada_trabalho, calcular_relatorio, extrair_dias,
+                                      extrair_dias_stream)
+from gerador_chat import FORMATO_MISTO, FORMATO_TRACO, FORMATO_COLCHETES, gerar_chat
+
+PARAMETROS_CALCULO = (8.0, 44.0, 1.0, 2000.0, "08:00", "18:00")
+
+# Variação (em relação à execução de referência) a partir da qual um benchmark é considerado regressão
+TOLERANCIA_REGRESSAO = 0.20
+
+# Módulos que o app só deve importar no primeiro uso (leitores de arquivos e exportação para Excel)
+MODULOS_SOB_DEMANDA = ("lxml", "PyPDF2", "PIL", "pytesseract", "openpyxl")
+
+# Executa o app.py uma vez, sem servidor (modo "bare" do Streamlit), e informa o tempo e os módulos carregados
+CODIGO_INICIALIZACAO = """
+import json, runpy, sys, time
+inicio = time.perf_counter()
+runpy.run_path(sys.argv[1], run_name="__main__")
+segundos = time.perf_counter() - inicio
+print(json.dumps({"segundos": segundos, "modulos": sorted(m for m in sys.modules if "." not in m)}))
+"""
+
+MAX_IMPORTACOES_RELATORIO = 10
+
+# Os leitores de arquivos são medidos sobre um trecho do chat, já que PDF e OCR são ordens de grandeza
+# mais lentos que a leitura do texto
+MAX_LINHAS_LEITORES = 10000
+LINHAS_POR_PAGINA_PDF = 80
+IMAGENS_OCR = 4
+LINHAS_POR_IMAGEM_OCR = 30
+
+PARTES_DOCX = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        '</Types>'),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="word/document.xml" Type='
+        '"http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'),
+}
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        return None
+
+
+def medir(funcao, repeticoes):
+    """Executa 'funcao' algumas vezes e retorna o menor tempo (s) e o último resultado."""
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+
+def gerar_docx(linhas):
+    """
+    Monta em memória um .docx com a primeira metade das linhas em
+    parágrafos e a segunda em uma tabela (data e hora em uma célula, o
+    restante da mensagem na outra), como nas folhas de ponto exportadas.
+    """
+    from xml.sax.saxutils import escape
+
+    def paragrafo(texto):
+        return f'<w:p><w:r><w:t xml:space="preserve">{escape(texto)}</w:t></w:r></w:p>'
+
+    metade = len(linhas) // 2
+    corpo = [paragrafo(linha) for linha in linhas[:metade]]
+    corpo.append("<w:tbl>")
+    for linha in linhas[metade:]:
+        celulas = linha.split(" - ", 1) if " - " in linha else [linha]
+        corpo.append("<w:tr>" + "".join(f"<w:tc>{paragrafo(celula)}</w:tc>" for celula in celulas) + "</w:tr>")
+    corpo.append("</w:tbl>")
+    documento = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                 '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                 f'<w:body>{"".join(corpo)}</w:body></w:document>')
+
+    saida = io.BytesIO()
+    with zipfile.ZipFile(saida, "w", zipfile.ZIP_DEFLATED) as pacote:
+        for nome, conteudo in PARTES_DOCX.items():
+            pacote.writestr(nome, conteudo)
+        pacote.writestr("word/document.xml", documento)
+    return saida.getvalue()
+
+
+def gerar_pdf(linhas, linhas_por_pagina=LINHAS_POR_PAGINA_PDF):
+    """Monta com o PyPDF2 um PDF de texto (Helvetica) com 'linhas_por_pagina' linhas por página."""
+    from PyPDF2 import PageObject, PdfWriter
+    from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+    escritor = PdfWriter()
+    fonte = escritor._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+        NameObject("/Encoding"): NameObject("/WinAnsiEncoding"),
+    }))
+    for inicio in range(0, len(linhas), linhas_por_pagina):
+        texto = b"".join(
+            b"(" + linha.encode("cp1252", errors="replace").replace(b"\\", b"\\\\").replace(b"(", b"\\(")
+            .replace(b")", b"\\)") + b") Tj T* "
+            for linha in linhas[inicio:inicio + linhas_por_pagina])
+        conteudo = DecodedStreamObject()
+        conteudo.set_data(b"BT /F1 7 Tf 9 TL 20 820 Td " + texto + b"ET")
+        pagina = PageObject.create_blank_page(width=595, height=842)
+        pagina[NameObject("/Resources")] = DictionaryObject(
+            {NameObject("/Font"): DictionaryObject({NameObject("/F1"): fonte})})
+        pagina[NameObject("/Contents")] = escritor._add_object(conteudo)
+        escritor.add_page(pagina)
+
+    saida = io.BytesIO()
+    escritor.write(saida)
+    return saida.getvalue()
+
+
+def gerar_imagens(linhas, quantidade=IMAGENS_OCR, linhas_por_imagem=LINHAS_POR_IMAGEM_OCR):
+    """Desenha trechos do chat em imagens PNG (texto preto sobre fundo branco) para o OCR."""
+    from PIL import Image, ImageDraw
+
+    imagens = []
+    for indice in range(quantidade):
+        trecho = linhas[indice * linhas_por_imagem:(indice + 1) * linhas_por_imagem]
+        imagem = Image.new("L", (1400, 20 * linhas_por_imagem + 40), 255)
+        desenho = ImageDraw.Draw(imagem)
+        for numero, linha in enumerate(trecho):
+            desenho.text((20, 20 + 20 * numero), linha, fill=0)
+        saida = io.BytesIO()
+        imagem.save(saida, "PNG")
+        imagens.append(saida.getvalue())
+    return imagens
+
+
+def executar_benchmarks(dias=365, mensagens_por_dia=200, remetentes=10, formato=FORMATO_MISTO,
+                        repeticoes=3, semente=42):
+    """
+    Mede cada etapa do pipeline sobre um chat sintético determinístico e
+    retorna um dicionário {nome: {'segundos', 'itens', 'itens_por_segundo'}}.
+    """
+    texto = gerar_chat(dias=dias, mensagens_por_dia=mensagens_por_dia, remetentes=remetentes,
+                       formato=formato, semente=semente)
+    total_linhas = texto.count("\n") + 1
+    resultados = {}
+
+    def registrar(nome, segundos, itens):
+        resultados[nome] = {
+            "segundos": round(segundos, 6),
+            "itens": itens,
+            "itens_por_segundo": round(itens / segundos, 1) if segundos > 0 else None,
+        }
+        logging.info(f"{nome:<22} {segundos:9.4f}s  {itens:>10} itens  "
+                     f"{resultados[nome]['itens_por_segundo'] or 0:>12.0f} itens/s")
+
+    # Leitura do texto até a tabela de dias (linhas/s)
+    segundos, (df_dias, _) = medir(lambda: extrair_dias(texto), repeticoes)
+    registrar("parse", segundos, total_linhas)
+
+    segundos, _ = medir(lambda: extrair_dias_stream(io.StringIO(texto)), repeticoes)
+    registrar("parse_stream", segundos, total_linhas)
+
+    # Agregação diária sobre mensagens já convertidas (mensagens/s)
+    aleatorio = np.random.default_rng(semente)
+    inicio = np.datetime64("2023-01-02T06:00:00")
+    deslocamentos = aleatorio.integers(0, dias * 86400, size=dias * mensagens_por_dia).astype("timedelta64[s]")
+    df_mensagens = pd.DataFrame({"data_hora": (inicio + deslocamentos).astype("datetime64[ns]")})
+    segundos, _ = medir(lambda: agregar_dias(df_mensagens), repeticoes)
+    registrar("agregacao_diaria", segundos, len(df_mensagens))
+
+    # Cálculo do relatório e do resumo (dias/s)
+    segundos, (df_relatorio, resumo) = medir(lambda: calcular_relatorio(df_dias, *PARAMETROS_CALCULO), repeticoes)
+    registrar("resumo", segundos, len(df_dias))
+
+    try:
+        from exportacao_excel import gerar_excel
+    except ImportError:
+        logging.warning("openpyxl não instalado; benchmark de exportação para Excel ignorado.")
+    else:
+        segundos, _ = medir(lambda: gerar_excel(df_relatorio, resumo), repeticoes)
+        registrar("exportacao_excel", segundos, len(df_relatorio))
+
+    segundos, _ = medir(lambda: analise_jornada_trabalho(texto, *PARAMETROS_CALCULO), repeticoes)
+    registrar("ponta_a_ponta", segundos, total_linhas)
+
+    executar_benchmarks_leitores(texto.splitlines()[:MAX_LINHAS_LEITORES], repeticoes, registrar)
+    return resultados
+
+
+def executar_benchmarks_leitores(linhas, repeticoes, registrar):
+    """
+    Mede os leitores de arquivos (linhas/s) sobre arquivos gerados a partir
+    das linhas do chat: PDF (em um processo e com o pool de páginas), DOCX
+    com parágrafos e tabela, e OCR de imagens. Leitores sem as dependências
+    instaladas são ignorados com um aviso.
+    """
+    try:
+        from leitor_pdf import iterar_paginas_pdf
+    except ImportError:
+        logging.warning("PyPDF2 não instalado; benchmark de leitura de PDF ignorado.")
+    else:
+        pdf = gerar_pdf(linhas)
+        segundos, _ = medir(lambda: "\n".join(iterar_paginas_pdf(pdf, processos=1)), repeticoes)
+        registrar("leitura_pdf", segundos, len(linhas))
+        if (os.cpu_count() or 1) > 1:
+            segundos, _ = medir(lambda: "\n".join(iterar_paginas_pdf(pdf)), repeticoes)
+            registrar("leitura_pdf_paralela", segundos, len(linhas))
+
+    try:
+        from leitor_docx import iterar_linhas_docx
+    except ImportError:
+        logging.warning("lxml não instalado; benchmark de leitura de DOCX ignorado.")
+    else:
+        docx = gerar_docx(linhas)
+        segundos, _ = medir(lambda: "\n".join(iterar_linhas_docx(docx)), repeticoes)
+        registrar("leitura_docx", segundos, len(linhas))
+
+    try:
+        import pytesseract
+        from leitor_ocr import ler_imagens
+        pytesseract.get_tesseract_version()
+    except Exception:
+        logging.warning("Pillow, pytesseract ou o Tesseract não instalados; benchmark de OCR ignorado.")
+    else:
+        imagens = gerar_imagens(linhas)
+        # Sem o cache de OCR, que faria as repetições medirem só a leitura do cache
+        segundos, _ = medir(lambda: ler_imagens(imagens, usar_cache=False), repeticoes)
+        registrar("leitura_ocr", segundos, min(len(linhas), IMAGENS_OCR * LINHAS_POR_IMAGEM_OCR))
+
+
+def _maiores_importacoes(saida_importtime, limite=MAX_IMPORTACOES_RELATORIO):
+    """Extrai da saída de 'python -X importtime' as importações de primeiro nível mais demoradas."""
+    importacoes = []
+    for linha in saida_importtime.splitlines():
+        if not linha.startswith("import time:"):
+            continue
+        _, acumulado, nome = linha.split("|")
+        # Importações de primeiro nível têm um único espaço antes do nome
+        if acumulado.strip().isdigit() and nome.startswith(" ") and not nome.startswith("  "):
+            importacoes.append({"modulo": nome.strip(), "segundos": round(int(acumulado) / 1e6, 4)})
+    return sorted(importacoes, key=lambda item: item["segundos"], reverse=True)[:limite]
+
+
+def medir_inicializacao(repeticoes=3):
+    """
+    Mede a inicialização a frio do app.py (primeira execução do script em
+    um interpretador novo) e retorna o menor tempo, os módulos sob demanda
+    carregados indevidamente e as importações mais demoradas.
+    """
+    diretorio = os.path.dirname(os.path.abspath(__file__))
+    melhor = None
+    for _ in range(repeticoes):
+        processo = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", CODIGO_INICIALIZACAO, os.path.join(diretorio, "app.py")],
+            capture_output=True, text=True, check=True, cwd=diretorio)
+        medida = json.loads(processo.stdout.strip().splitlines()[-1])
+        if melhor is None or medida["segundos"] < melhor["segundos"]:
+            melhor = {**medida, "importtime": processo.stderr}
+
+    carregados = [modulo for modulo in MODULOS_SOB_DEMANDA if modulo in melhor["modulos"]]
+    return {
+        "segundos": round(melhor["segundos"], 4),
+        "modulos_sob_demanda_carregados": carregados,
+        "maiores_importacoes": _maiores_importacoes(melhor["importtime"]),
+    }
+
+
+def comparar(atual, referencia, tolerancia=TOLERANCIA_REGRESSAO):
+    """Compara dois resultados e retorna a lista de benchmarks que regrediram além da tolerância."""
+    regressoes = []
+    for nome, medida in atual["resultados"].items():
+        anterior = referencia.get("resultados", {}).get(nome)
+        if not anterior:
+            continue
+        razao = medida["segundos"] / anterior["segundos"] if anterior["segundos"] else float("inf")
+        situacao = "REGRESSÃO" if razao > 1 + tolerancia else "ok"
+        logging.info(f"{nome:<22} {anterior['segundos']:9.4f}s -> {medida['segundos']:9.4f}s  "
+                     f"({razao:5.2f}x)  {situacao}")
+        if situacao != "ok":
+            regressoes.append(nome)
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do pipeline de análise de jornada.")
+    parser.add_argument("--dias", type=int, default=365)
+    parser.add_argument("--mensagens-por-dia", type=int, default=200)
+    parser.add_argument("--remetentes", type=int, default=10)
+    parser.add_argument("--formato", choices=[FORMATO_TRACO, FORMATO_COLCHETES, FORMATO_MISTO], default=FORMATO_MISTO)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", default="benchmark_resultados.json", help="Arquivo JSON com os resultados.")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior, para detectar regressões.")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_REGRESSAO)
+    parser.add_argument("--orcamento-inicializacao", type=float,
+                        help="Tempo máximo (s) de inicialização do app; acima disso, sai com código 1.")
+    args = parser.parse_args(argv)
+
+    configuracao = {
+        "dias": args.dias,
+        "mensagens_por_dia": args.mensagens_por_dia,
+        "remetentes": args.remetentes,
+        "formato": args.formato,
+        "repeticoes": args.repeticoes,
+        "semente": args.semente,
+    }
+    resultados = executar_benchmarks(**configuracao)
+
+    inicializacao = medir_inicializacao(args.repeticoes)
+    resultados["inicializacao_app"] = {"segundos": inicializacao["segundos"], "itens": 1,
+                                       "itens_por_segundo": None}
+    logging.info(f"{'inicializacao_app':<22} {inicializacao['segundos']:9.4f}s")
+    for importacao in inicializacao["maiores_importacoes"]:
+        logging.info(f"    import {importacao['modulo']:<30} {importacao['segundos']:9.4f}s")
+
+    relatorio = {
+        "commit": _commit_atual(),
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "configuracao": configuracao,
+        "resultados": resultados,
+        "inicializacao": inicializacao,
+    }
+
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    logging.info(f"Resultados salvos em {args.saida}")
+
+    falhou = False
+    if inicializacao["modulos_sob_demanda_carregados"]:
+        logging.error("Módulos importados na inicialização do app, mas que deveriam ser carregados só no "
+                      f"primeiro uso: {', '.join(inicializacao['modulos_sob_demanda_carregados'])}")
+        falhou = True
+    if args.orcamento_inicializacao and inicializacao["segundos"] > args.orcamento_inicializacao:
+        logging.error(f"Inicialização do app ({inicializacao['segundos']:.2f}s) acima do orçamento de "
+                      f"{args.orcamento_inicializacao:.2f}s.")
+        falhou = True
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            referencia = json.load(f)
+        if referencia.get("configuracao") != configuracao:
+            logging.warning("A execução de referência usou outra configuração; a comparação pode não ser válida.")
+        if comparar(relatorio, referencia, args.tolerancia):
+            falhou = True
+    return 1 if falhou else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
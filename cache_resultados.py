@@ -0,0 +1,135 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+# Diretório opcional para persistir os caches em disco (compartilhado entre sessões e processos)
+DIRETORIO_CACHE = os.environ.get("ANALISADOR_CACHE_DIR")
+
+
+def hash_bytes(dados):
+    """Retorna o hash SHA-256 (hex) de um conteúdo em bytes ou texto."""
+    if isinstance(dados, str):
+        dados = dados.encode("utf-8")
+    return hashlib.sha256(dados).hexdigest()
+
+
+def chave_analise(texto, *parametros):
+    """
+    Monta a chave de cache de uma análise: hash do texto extraído mais
+    os parâmetros do cálculo (salário, jornadas, intervalo e horários).
+    """
+    return hash_bytes(f"{hash_bytes(texto)}|{'|'.join(repr(p) for p in parametros)}")
+
+
+class CacheLRU:
+    """
+    Cache em memória com limite de itens e descarte do menos usado (LRU).
+    Se um diretório for informado, os valores também são gravados em disco
+    (pickle), limitado ao mesmo número de arquivos.
+    """
+
+    def __init__(self, max_itens, diretorio=None):
+        self.max_itens = max_itens
+        self.diretorio = Path(diretorio) if diretorio else None
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+        if self.diretorio:
+            self.diretorio.mkdir(parents=True, exist_ok=True)
+
+    def _caminho(self, chave):
+        return self.diretorio / f"{chave}.pkl"
+
+    def obter(self, chave, padrao=None):
+        with self._trava:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                return self._itens[chave]
+
+        if self.diretorio:
+            caminho = self._caminho(chave)
+            try:
+                with open(caminho, "rb") as f:
+                    valor = pickle.load(f)
+                os.utime(caminho)
+            except FileNotFoundError:
+                return padrao
+            except Exception as e:
+                logging.warning(f"Erro ao ler o cache em disco {caminho}: {e}")
+                return padrao
+            self._guardar_memoria(chave, valor)
+            return valor
+
+        return padrao
+
+    def guardar(self, chave, valor):
+        self._guardar_memoria(chave, valor)
+        if self.diretorio:
+            try:
+                caminho_temporario = self._caminho(chave).with_suffix(f".{os.getpid()}.tmp")
+                with open(caminho_temporario, "wb") as f:
+                    pickle.dump(valor, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(caminho_temporario, self._caminho(chave))
+                self._limitar_disco()
+            except Exception as e:
+                logging.warning(f"Erro ao gravar o cache em disco: {e}")
+
+    def obter_ou_calcular(self, chave, funcao):
+        """Retorna o valor em cache ou calcula com 'funcao()' e guarda o resultado."""
+        sentinela = object()
+        valor = self.obter(chave, sentinela)
+        if valor is sentinela:
+            valor = funcao()
+            self.guardar(chave, valor)
+        return valor
+
+    def limpar(self):
+        with self._trava:
+            self._itens.clear()
+        if self.diretorio:
+            for caminho in self.diretorio.glob("*.pkl"):
+                caminho.unlink(missing_ok=True)
+
+    def __contains__(self, chave):
+        with self._trava:
+            if chave in self._itens:
+                return True
+        return bool(self.diretorio) and self._caminho(chave).exists()
+
+    def __len__(self):
+        with self._trava:
+            return len(self._itens)
+
+    def _guardar_memoria(self, chave, valor):
+        with self._trava:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def _limitar_disco(self):
+        arquivos = sorted(self.diretorio.glob("*.pkl"), key=lambda p: p.stat().st_mtime)
+        for caminho in arquivos[:max(0, len(arquivos) - self.max_itens)]:
+            caminho.unlink(missing_ok=True)
+
+
+# Textos extraídos (PDF/DOCX/OCR), indexados pelo hash do arquivo enviado
+cache_textos = CacheLRU(
+    max_itens=64,
+    diretorio=os.path.join(DIRETORIO_CACHE, "textos") if DIRETORIO_CACHE else None
+)
+
+# Tabelas de entrada/saída por dia (etapa de leitura), indexadas pelo hash do texto
+cache_dias = CacheLRU(
+    max_itens=64,
+    diretorio=os.path.join(DIRETORIO_CACHE, "dias") if DIRETORIO_CACHE else None
+)
+
+# Resultados de análise, indexados pelo hash do texto e pelos parâmetros do cálculo
+cache_analises = CacheLRU(
+    max_itens=256,
+    diretorio=os.path.join(DIRETORIO_CACHE, "analises") if DIRETORIO_CACHE else None
+)
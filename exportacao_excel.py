@@ -0,0 +1,106 @@
+import copy
+import io
+import logging
+import os
+from functools import lru_cache
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+
+CAMINHO_MODELO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'modelo_relatorio.xlsx')
+
+ABA_RESUMO = 'Resumo da Análise'
+ABA_DETALHADA = 'Análise Detalhada'
+
+# Acima deste número de linhas o arquivo é gerado em modo write-only (streaming), com memória constante
+LIMITE_LINHAS_MODO_STREAMING = 20000
+
+
+@lru_cache(maxsize=4)
+def _carregar_modelo(caminho_modelo):
+    """
+    Lê o modelo uma única vez por processo. Retorna os bytes do arquivo e,
+    para o modo write-only, o estilo do cabeçalho e a largura das colunas
+    de cada aba.
+    """
+    with open(caminho_modelo, 'rb') as f:
+        dados = f.read()
+
+    estrutura = {}
+    for worksheet in load_workbook(io.BytesIO(dados)).worksheets:
+        estilos_cabecalho = [
+            (copy.copy(cell.font), copy.copy(cell.fill), copy.copy(cell.alignment), copy.copy(cell.border))
+            for cell in worksheet[1]
+        ]
+        larguras = {letra: dimensao.width for letra, dimensao in worksheet.column_dimensions.items()
+                    if dimensao.width}
+        estrutura[worksheet.title] = (estilos_cabecalho, larguras)
+    return dados, estrutura
+
+
+def _preencher_aba(worksheet, df):
+    """Escreve o cabeçalho (mantendo o estilo do modelo) e as linhas em bloco."""
+    if worksheet.max_row > 1:
+        worksheet.delete_rows(2, worksheet.max_row - 1)
+    for indice, nome in enumerate(df.columns, 1):
+        worksheet.cell(row=1, column=indice).value = nome
+
+    for linha in df.itertuples(index=False, name=None):
+        worksheet.append(linha)
+
+
+def _preencher_aba_streaming(worksheet, df, estilos_cabecalho, larguras):
+    """Versão write-only de _preencher_aba: as linhas são gravadas direto no arquivo."""
+    for letra, largura in larguras.items():
+        worksheet.column_dimensions[letra].width = largura
+
+    cabecalho = []
+    for indice, nome in enumerate(df.columns):
+        cell = WriteOnlyCell(worksheet, value=nome)
+        if indice < len(estilos_cabecalho):
+            cell.font, cell.fill, cell.alignment, cell.border = (copy.copy(e) for e in estilos_cabecalho[indice])
+        cabecalho.append(cell)
+    worksheet.append(cabecalho)
+
+    for linha in df.itertuples(index=False, name=None):
+        worksheet.append(linha)
+
+
+def gerar_excel(df, resumo, caminho_modelo=CAMINHO_MODELO):
+    """
+    Gera o arquivo Excel em memória com as abas de resumo e detalhada,
+    seguindo o modelo (carregado uma vez por processo). Relatórios grandes
+    são gravados em modo write-only. Sem o modelo, gera um arquivo simples.
+    """
+    df_resumo = pd.DataFrame(resumo.items(), columns=['Métrica', 'Valor'])
+    buffer = io.BytesIO()
+
+    try:
+        modelo = _carregar_modelo(caminho_modelo)
+    except FileNotFoundError:
+        logging.warning(f"Arquivo de modelo '{caminho_modelo}' não encontrado. Gerando um arquivo simples.")
+        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+            df_resumo.to_excel(writer, sheet_name=ABA_RESUMO, index=False)
+            df.to_excel(writer, sheet_name=ABA_DETALHADA, index=False)
+        buffer.seek(0)
+        return buffer
+
+    dados_modelo, estrutura = modelo
+    dados_abas = {ABA_RESUMO: df_resumo, ABA_DETALHADA: df}
+
+    if len(df) > LIMITE_LINHAS_MODO_STREAMING:
+        workbook = Workbook(write_only=True)
+        # Mantém a ordem das abas do modelo
+        for titulo, (estilos_cabecalho, larguras) in estrutura.items():
+            if titulo in dados_abas:
+                _preencher_aba_streaming(workbook.create_sheet(titulo), dados_abas[titulo],
+                                         estilos_cabecalho, larguras)
+    else:
+        workbook = load_workbook(io.BytesIO(dados_modelo))
+        for titulo, df_aba in dados_abas.items():
+            _preencher_aba(workbook[titulo], df_aba)
+
+    workbook.save(buffer)
+    buffer.seek(0)
+    return buffer
@@ -0,0 +1,149 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Estados de uma tarefa
+NA_FILA = "na_fila"
+EXECUTANDO = "executando"
+CONCLUIDA = "concluida"
+CANCELADA = "cancelada"
+ERRO = "erro"
+
+ESTADOS_FINAIS = (CONCLUIDA, CANCELADA, ERRO)
+
+# Tarefas encerradas mantidas no registro (as mais antigas são descartadas)
+MAX_TAREFAS_ENCERRADAS = 100
+
+
+class TarefaCancelada(Exception):
+    """Levantada dentro de uma tarefa quando o cancelamento foi solicitado."""
+
+
+class Tarefa:
+    """
+    Uma execução em segundo plano. A função da tarefa recebe o próprio
+    objeto para informar o progresso (atualizar) e verificar se foi
+    cancelada (verificar_cancelamento) entre as etapas.
+    """
+
+    def __init__(self, chave, descricao):
+        self.id = uuid.uuid4().hex
+        self.chave = chave
+        self.descricao = descricao
+        self.estado = NA_FILA
+        self.progresso = {}
+        self.resultado = None
+        self.erro = None
+        self.criada_em = time.time()
+        self.iniciada_em = None
+        self.encerrada_em = None
+        self._cancelamento = threading.Event()
+        self._futuro = None
+        self._trava = threading.Lock()
+
+    def atualizar(self, **progresso):
+        """Registra o progresso atual (ex.: etapa='extracao', paginas=12)."""
+        with self._trava:
+            self.progresso = {**self.progresso, **progresso}
+
+    def verificar_cancelamento(self):
+        if self._cancelamento.is_set():
+            raise TarefaCancelada()
+
+    def cancelar(self):
+        """Cancela a tarefa: se ainda estiver na fila, ela nem chega a executar."""
+        self._cancelamento.set()
+        if self._futuro is not None and self._futuro.cancel():
+            self._encerrar(CANCELADA)
+
+    @property
+    def encerrada(self):
+        return self.estado in ESTADOS_FINAIS
+
+    @property
+    def segundos(self):
+        if self.iniciada_em is None:
+            return 0.0
+        return (self.encerrada_em or time.time()) - self.iniciada_em
+
+    def _encerrar(self, estado, resultado=None, erro=None):
+        with self._trava:
+            self.estado, self.resultado, self.erro = estado, resultado, erro
+            self.encerrada_em = time.time()
+
+    def _executar(self, funcao, args, kwargs):
+        if self._cancelamento.is_set():
+            self._encerrar(CANCELADA)
+            return
+        self.estado = EXECUTANDO
+        self.iniciada_em = time.time()
+        try:
+            resultado = funcao(self, *args, **kwargs)
+        except TarefaCancelada:
+            self._encerrar(CANCELADA)
+        except Exception as e:
+            logging.exception(f"Erro na tarefa '{self.descricao}'")
+            self._encerrar(ERRO, erro=str(e))
+        else:
+            self._encerrar(CONCLUIDA, resultado=resultado)
+
+
+class FilaTarefas:
+    """
+    Fila de tarefas executadas por um pool de threads, com um registro
+    local por id. O registro vive no processo, então as tarefas continuam
+    entre reruns do Streamlit e podem ser acompanhadas por qualquer sessão.
+    Tarefas com a mesma chave (ex.: mesmo arquivo e parâmetros) ainda na
+    fila, em execução ou concluídas são reaproveitadas em vez de refeitas.
+    """
+
+    def __init__(self, max_trabalhadores=None):
+        self.max_trabalhadores = max_trabalhadores or min(4, os.cpu_count() or 1)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_trabalhadores,
+                                            thread_name_prefix="fila_tarefas")
+        self._tarefas = {}
+        self._trava = threading.Lock()
+
+    def enviar(self, chave, descricao, funcao, *args, **kwargs):
+        """Agenda funcao(tarefa, *args, **kwargs) e retorna a Tarefa."""
+        with self._trava:
+            for tarefa in self._tarefas.values():
+                if tarefa.chave == chave and tarefa.estado in (NA_FILA, EXECUTANDO, CONCLUIDA):
+                    return tarefa
+
+            tarefa = Tarefa(chave, descricao)
+            self._tarefas[tarefa.id] = tarefa
+            self._descartar_encerradas()
+            tarefa._futuro = self._executor.submit(tarefa._executar, funcao, args, kwargs)
+            return tarefa
+
+    def obter(self, id_tarefa):
+        with self._trava:
+            return self._tarefas.get(id_tarefa)
+
+    def cancelar(self, id_tarefa):
+        tarefa = self.obter(id_tarefa)
+        if tarefa is not None:
+            tarefa.cancelar()
+        return tarefa
+
+    def listar(self):
+        with self._trava:
+            return sorted(self._tarefas.values(), key=lambda tarefa: tarefa.criada_em)
+
+    def _descartar_encerradas(self):
+        encerradas = sorted((tarefa for tarefa in self._tarefas.values() if tarefa.encerrada),
+                            key=lambda tarefa: tarefa.encerrada_em)
+        for tarefa in encerradas[:max(0, len(encerradas) - MAX_TAREFAS_ENCERRADAS)]:
+            del self._tarefas[tarefa.id]
+
+    def __len__(self):
+        with self._trava:
+            return len(self._tarefas)
+
+
+# Fila compartilhada pelas sessões do app
+fila_analises = FilaTarefas()
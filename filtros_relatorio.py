@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+# Colunas do relatório usadas pelos filtros, quando presentes
+COLUNA_REMETENTE = 'Remetente'
+
+
+def preparar_filtros(df_relatorio):
+    """
+    Calcula uma única vez, para cada linha do relatório, as colunas usadas
+    nos filtros: a data (datetime64), o dia da semana (0 = segunda) e os
+    indicadores de fim de semana, acionamento atípico e inconsistência.
+    O relatório em si não é alterado, para não mudar a exportação.
+    """
+    data = pd.to_datetime(df_relatorio['Data'])
+    observacoes = df_relatorio['Observações'].fillna('').str.lower()
+    dia_semana = data.dt.weekday.astype('int8')
+
+    flags = pd.DataFrame({
+        'data': data,
+        'dia_semana': dia_semana,
+        'fim_de_semana': (dia_semana >= 5).to_numpy(),
+        'atipico': observacoes.str.contains('atípico', regex=False).to_numpy(),
+        'inconsistencia': (observacoes.str.contains('incompleto', regex=False)
+                           | observacoes.str.contains('inconsistência', regex=False)).to_numpy(),
+    }, index=df_relatorio.index)
+    if COLUNA_REMETENTE in df_relatorio.columns:
+        flags['remetente'] = df_relatorio[COLUNA_REMETENTE].astype('category').cat.remove_unused_categories()
+    return flags
+
+
+def mascara_filtros(flags, inicio=None, fim=None, dias_semana=None, atipico=False, inconsistencia=False,
+                    remetentes=None):
+    """
+    Combina os filtros ativos em uma única máscara booleana (numpy) sobre
+    as colunas de preparar_filtros. As datas são inclusivas; dias_semana e
+    remetentes, quando informados, mantêm as linhas de qualquer um deles.
+    """
+    mascara = np.ones(len(flags), dtype=bool)
+    if inicio is not None:
+        mascara &= (flags['data'] >= pd.Timestamp(inicio)).to_numpy()
+    if fim is not None:
+        mascara &= (flags['data'] < pd.Timestamp(fim) + pd.Timedelta(days=1)).to_numpy()
+    if dias_semana:
+        mascara &= np.isin(flags['dia_semana'].to_numpy(), list(dias_semana))
+    if atipico:
+        mascara &= flags['atipico'].to_numpy()
+    if inconsistencia:
+        mascara &= flags['inconsistencia'].to_numpy()
+    if remetentes and 'remetente' in flags.columns:
+        mascara &= flags['remetente'].isin(remetentes).to_numpy()
+    return mascara
+
+
+def filtrar_relatorio(df_relatorio, flags, **filtros):
+    """Aplica os filtros ao relatório; sem filtros ativos, retorna o próprio relatório, sem cópia."""
+    mascara = mascara_filtros(flags, **filtros)
+    if mascara.all():
+        return df_relatorio
+    return df_relatorio[mascara]
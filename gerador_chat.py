@@ -0,0 +1,68 @@
+import random
+from datetime import date, datetime, timedelta
+
+# Formatos de exportação aceitos por PADRAO_MENSAGEM
+FORMATO_TRACO = "traco"          # 20/12/2023 08:15 - Nome: mensagem
+FORMATO_COLCHETES = "colchetes"  # [20/12/2023, 08:15:42] Nome: mensagem
+FORMATO_MISTO = "misto"
+
+MENSAGENS_MIDIA = ["<Mídia oculta>", "imagem omitida", "áudio ocultado", "vídeo omitido"]
+MENSAGEM_APAGADA = "Mensagem apagada"
+AVISO_CRIPTOGRAFIA = ("As mensagens e ligações são protegidas com a criptografia de ponta a ponta "
+                      "e ficam somente entre você e os participantes desta conversa")
+
+PALAVRAS = ["bom", "dia", "cheguei", "saindo", "almoço", "cliente", "relatório", "ok", "entregue",
+            "reunião", "obra", "pedido", "rota", "finalizado", "atraso", "visita", "nota", "conferido"]
+
+
+def _formatar(momento, remetente, conteudo, formato, ano_curto):
+    data_str = momento.strftime("%d/%m/%y" if ano_curto else "%d/%m/%Y")
+    if formato == FORMATO_COLCHETES:
+        return f"[{data_str}, {momento:%H:%M:%S}] {remetente}: {conteudo}"
+    return f"{data_str} {momento:%H:%M} - {remetente}: {conteudo}"
+
+
+def gerar_linhas(dias=30, mensagens_por_dia=40, remetentes=5, formato=FORMATO_TRACO,
+                 prob_multilinha=0.05, prob_midia=0.10, prob_apagada=0.02, ano_curto=False,
+                 data_inicial=date(2023, 1, 2), semente=42):
+    """
+    Gera, de forma determinística (mesma semente, mesmas linhas), as linhas
+    de uma exportação sintética de grupo do WhatsApp: mensagens entre 06:00
+    e 23:59, linhas de continuação, mídias ocultas, mensagens apagadas e o
+    aviso de criptografia do sistema.
+    """
+    aleatorio = random.Random(semente)
+    nomes = [f"Funcionário {i + 1:02d}" for i in range(remetentes)]
+
+    yield _formatar(datetime.combine(data_inicial, datetime.min.time()), AVISO_CRIPTOGRAFIA,
+                    "Toque para saber mais.", FORMATO_TRACO, ano_curto)
+
+    for deslocamento in range(dias):
+        dia = data_inicial + timedelta(days=deslocamento)
+        meia_noite = datetime.combine(dia, datetime.min.time())
+        segundos = sorted(aleatorio.randint(6 * 3600, 24 * 3600 - 1) for _ in range(mensagens_por_dia))
+
+        for segundo in segundos:
+            momento = meia_noite + timedelta(seconds=segundo)
+            formato_linha = formato
+            if formato == FORMATO_MISTO:
+                formato_linha = aleatorio.choice([FORMATO_TRACO, FORMATO_COLCHETES])
+
+            sorteio = aleatorio.random()
+            if sorteio < prob_midia:
+                conteudo = aleatorio.choice(MENSAGENS_MIDIA)
+            elif sorteio < prob_midia + prob_apagada:
+                conteudo = MENSAGEM_APAGADA
+            else:
+                conteudo = " ".join(aleatorio.choices(PALAVRAS, k=aleatorio.randint(1, 12)))
+
+            yield _formatar(momento, aleatorio.choice(nomes), conteudo, formato_linha, ano_curto)
+
+            if aleatorio.random() < prob_multilinha:
+                for _ in range(aleatorio.randint(1, 3)):
+                    yield " ".join(aleatorio.choices(PALAVRAS, k=aleatorio.randint(1, 8)))
+
+
+def gerar_chat(**kwargs):
+    """Retorna a exportação sintética completa como texto (ver gerar_linhas)."""
+    return "\n".join(gerar_linhas(**kwargs))
@@ -0,0 +1,206 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from analise_jornada_trabalho import (PADRAO_MENSAGEM, calcular_dias_relatorio, calcular_semanas, converter_data_hora,
+                                      extrair_dias, resumir_relatorio)
+from instrumentacao import etapa
+
+TAMANHO_BLOCO_LEITURA = 1024 * 1024
+
+
+def _hash_prefixo(arquivo, tamanho):
+    """Calcula o SHA-256 dos primeiros 'tamanho' bytes de um arquivo aberto, em blocos."""
+    arquivo.seek(0)
+    sha = hashlib.sha256()
+    restante = tamanho
+    while restante > 0:
+        bloco = arquivo.read(min(TAMANHO_BLOCO_LEITURA, restante))
+        if not bloco:
+            break
+        sha.update(bloco)
+        restante -= len(bloco)
+    return sha.hexdigest()
+
+
+def _inicio_ultimo_dia(dados, ultimo_dia):
+    """
+    Retorna a posição (em bytes) da primeira linha de mensagem do último dia
+    lido. A próxima execução relê a partir daí, já que esse dia pode
+    continuar no trecho novo (mensagens ou linhas de continuação).
+    """
+    fim = len(dados)
+    posicao = None
+    formatos = []
+    while fim > 0:
+        inicio = dados.rfind(b'\n', 0, fim - 1) + 1
+        linha = dados[inicio:fim].decode('utf-8', errors='replace').lstrip('‎‏').strip()
+        fim = inicio
+        match = PADRAO_MENSAGEM.match(linha)
+        if not match:
+            continue
+        data_hora = converter_data_hora(match.group(1), match.group(2), formatos)
+        if data_hora is None:
+            continue
+        if data_hora.date() < ultimo_dia:
+            break
+        if data_hora.date() == ultimo_dia:
+            posicao = inicio
+    return posicao
+
+
+class IngestaoIncremental:
+    """
+    Mantém, para cada fonte (ex.: a exportação semanal de um grupo), a
+    posição já processada do arquivo, o checksum desse prefixo e as tabelas
+    de dias, do relatório e dos totais semanais. Se o arquivo novo começa
+    com o mesmo prefixo, apenas o trecho final é lido; senão, tudo é refeito.
+    """
+
+    def __init__(self, diretorio_estado, fonte):
+        self.pasta = Path(diretorio_estado) / hashlib.sha256(str(fonte).encode('utf-8')).hexdigest()[:16]
+        self.fonte = str(fonte)
+
+    def _caminho(self, nome):
+        return self.pasta / nome
+
+    def _carregar(self):
+        try:
+            with open(self._caminho('estado.json'), encoding='utf-8') as f:
+                estado = json.load(f)
+            df_dias = pd.read_pickle(self._caminho('dias.pkl'))
+            df_relatorio = pd.read_pickle(self._caminho('relatorio.pkl'))
+            df_semanas = pd.read_pickle(self._caminho('semanas.pkl'))
+        except FileNotFoundError:
+            return None
+        return estado, df_dias, df_relatorio, df_semanas
+
+    def _salvar(self, estado, df_dias, df_relatorio, df_semanas):
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        df_dias.to_pickle(self._caminho('dias.pkl'))
+        df_relatorio.to_pickle(self._caminho('relatorio.pkl'))
+        df_semanas.to_pickle(self._caminho('semanas.pkl'))
+        # O estado é gravado por último: se algo falhar antes, a próxima execução refaz o trecho
+        caminho_temporario = self._caminho(f'.estado.{os.getpid()}.tmp')
+        with open(caminho_temporario, 'w', encoding='utf-8') as f:
+            json.dump(estado, f, ensure_ascii=False, indent=2)
+        os.replace(caminho_temporario, self._caminho('estado.json'))
+
+    def analisar(self, caminho_arquivo, jornada_diaria, carga_horaria_semanal, tempo_intervalo,
+                 salario_bruto, horario_inicio_str, horario_fim_str):
+        """
+        Processa o arquivo a partir do ponto já lido e retorna
+        (df_relatorio, resumo) do histórico completo.
+        """
+        parametros = [jornada_diaria, carga_horaria_semanal, tempo_intervalo, salario_bruto,
+                      horario_inicio_str, horario_fim_str]
+        anterior = self._carregar()
+
+        with open(caminho_arquivo, 'rb') as arquivo:
+            tamanho = os.fstat(arquivo.fileno()).st_size
+            offset = 0
+            if anterior:
+                estado = anterior[0]
+                if estado['offset'] <= tamanho and _hash_prefixo(arquivo, estado['offset']) == estado['checksum_prefixo']:
+                    offset = estado['offset']
+                else:
+                    logging.info(f"O início de {caminho_arquivo} mudou; reprocessando o arquivo inteiro.")
+                    anterior = None
+            arquivo.seek(offset)
+            dados_novos = arquivo.read()
+
+        with etapa("leitura_incremental", bytes=len(dados_novos), offset=offset) as registro:
+            df_dias_novos, erro = extrair_dias(dados_novos.decode('utf-8', errors='replace'))
+            registro['dias'] = len(df_dias_novos)
+
+        if anterior:
+            _, df_dias, df_relatorio, df_semanas = anterior
+        else:
+            df_dias = df_relatorio = df_semanas = None
+
+        if erro:
+            if df_relatorio is None or df_relatorio.empty:
+                return pd.DataFrame(), {"erro": erro}
+            # Nada novo no trecho final: o histórico armazenado continua válido
+            return df_relatorio, resumir_relatorio(df_relatorio, df_semanas)
+
+        if df_dias is None or anterior[0]['parametros'] != parametros:
+            # Primeira execução ou parâmetros diferentes: recalcula o relatório de todo o histórico
+            df_dias_base = df_dias if df_dias is not None else df_dias_novos.iloc[:0]
+            df_relatorio = calcular_dias_relatorio(df_dias_base, jornada_diaria, tempo_intervalo, salario_bruto,
+                                                   horario_inicio_str, horario_fim_str) \
+                if not df_dias_base.empty else None
+            df_semanas = None
+
+        # Os dias do trecho novo substituem os armazenados a partir do primeiro dia relido
+        primeiro_dia_novo = df_dias_novos['data'].min()
+        df_dias_mantidos = df_dias[df_dias['data'] < primeiro_dia_novo] if df_dias is not None else df_dias_novos.iloc[:0]
+        df_dias = pd.concat([df_dias_mantidos, df_dias_novos], ignore_index=True)
+
+        df_relatorio_novo = calcular_dias_relatorio(df_dias_novos, jornada_diaria, tempo_intervalo, salario_bruto,
+                                                    horario_inicio_str, horario_fim_str)
+        if df_relatorio is not None:
+            df_relatorio_mantido = df_relatorio[df_relatorio['Data'] < primeiro_dia_novo.date()]
+            df_relatorio = pd.concat([df_relatorio_mantido, df_relatorio_novo], ignore_index=True)
+        else:
+            df_relatorio = df_relatorio_novo
+
+        # Recalcula apenas as semanas afetadas pelos dias novos
+        semanas_afetadas = set(df_relatorio_novo['semana_do_ano'])
+        semanas_recalculadas = calcular_semanas(
+            df_relatorio[df_relatorio['semana_do_ano'].isin(semanas_afetadas)], carga_horaria_semanal)
+        if df_semanas is None:
+            df_semanas = calcular_semanas(df_relatorio, carga_horaria_semanal)
+        else:
+            df_semanas = pd.concat([df_semanas[~df_semanas['semana_do_ano'].isin(semanas_afetadas)],
+                                    semanas_recalculadas]).sort_values('semana_do_ano', ignore_index=True)
+
+        # Próxima leitura começa no último dia, que ainda pode receber mensagens
+        inicio_relativo = _inicio_ultimo_dia(dados_novos, df_dias_novos['data'].max().date())
+        novo_offset = offset + inicio_relativo if inicio_relativo is not None else offset
+        with open(caminho_arquivo, 'rb') as arquivo:
+            checksum = _hash_prefixo(arquivo, novo_offset)
+
+        estado = {
+            'fonte': self.fonte,
+            'offset': novo_offset,
+            'checksum_prefixo': checksum,
+            'ultimo_timestamp': str(df_dias['saida'].max()),
+            'parametros': parametros,
+        }
+        self._salvar(estado, df_dias, df_relatorio, df_semanas)
+        return df_relatorio, resumir_relatorio(df_relatorio, df_semanas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Analisa uma exportação de chat que cresce a cada semana, lendo apenas o trecho novo.")
+    parser.add_argument('arquivo', help="Exportação do chat (.txt).")
+    parser.add_argument('--fonte', help="Identificador da fonte (padrão: caminho do arquivo).")
+    parser.add_argument('--estado', default='.estado_incremental', help="Diretório do estado incremental.")
+    parser.add_argument('--salario', type=float, default=2000.0)
+    parser.add_argument('--jornada-diaria', type=float, default=8.0)
+    parser.add_argument('--jornada-semanal', type=float, default=44.0)
+    parser.add_argument('--intervalo', type=float, default=1.0)
+    parser.add_argument('--horario-inicio', default="08:00")
+    parser.add_argument('--horario-fim', default="18:00")
+    args = parser.parse_args(argv)
+
+    ingestao = IngestaoIncremental(args.estado, args.fonte or os.path.abspath(args.arquivo))
+    df_relatorio, resumo = ingestao.analisar(args.arquivo, args.jornada_diaria, args.jornada_semanal, args.intervalo,
+                                             args.salario, args.horario_inicio, args.horario_fim)
+    if "erro" in resumo:
+        logging.warning(resumo["erro"])
+        return 1
+    for chave, valor in resumo.items():
+        logging.info(f"{chave}: {valor}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,79 @@
+import json
+import logging
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import pandas as pd
+
+# Logger dos registros estruturados (um JSON por etapa)
+logger = logging.getLogger("analisador.diagnostico")
+
+# Coletor ativo no contexto atual; sem coletor, as etapas não são medidas
+_coletor_atual = ContextVar("coletor_diagnostico", default=None)
+
+
+class Diagnostico:
+    """
+    Coleta o tempo, as contagens e, opcionalmente, o pico de memória de
+    cada etapa do pipeline executada dentro do bloco 'with'. A medição de
+    memória usa tracemalloc, que deixa a execução sensivelmente mais lenta.
+    Se informado, ao_registrar(registro) é chamado ao fim de cada etapa
+    (ex.: para informar o progresso de uma tarefa em segundo plano).
+    """
+
+    def __init__(self, medir_memoria=False, emitir_logs=False, ao_registrar=None):
+        self.medir_memoria = medir_memoria
+        self.emitir_logs = emitir_logs
+        self.ao_registrar = ao_registrar
+        self.etapas = []
+        self._token = None
+        self._iniciou_tracemalloc = False
+
+    def __enter__(self):
+        if self.medir_memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._iniciou_tracemalloc = True
+        self._token = _coletor_atual.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        _coletor_atual.reset(self._token)
+        if self._iniciou_tracemalloc:
+            tracemalloc.stop()
+            self._iniciou_tracemalloc = False
+        return False
+
+    def como_dataframe(self):
+        return pd.DataFrame(self.etapas)
+
+
+@contextmanager
+def etapa(nome, **contagens):
+    """
+    Mede uma etapa do pipeline. O dicionário retornado pode receber
+    contagens durante a execução (ex.: registro['linhas'] = 1000). Fora de
+    um Diagnostico, não faz nenhuma medição.
+    """
+    registro = {"etapa": nome, **contagens}
+    coletor = _coletor_atual.get()
+    if coletor is None:
+        yield registro
+        return
+
+    if coletor.medir_memoria:
+        memoria_inicial = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    finally:
+        registro["segundos"] = round(time.perf_counter() - inicio, 4)
+        if coletor.medir_memoria:
+            registro["pico_memoria_mb"] = round((tracemalloc.get_traced_memory()[1] - memoria_inicial) / 2 ** 20, 2)
+        coletor.etapas.append(registro)
+        if coletor.emitir_logs:
+            logger.info(json.dumps(registro, ensure_ascii=False, default=str))
+        if coletor.ao_registrar is not None:
+            coletor.ao_registrar(registro)
@@ -0,0 +1,292 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from analise_jornada_trabalho import (DIAS_DA_SEMANA, ERRO_SEM_MENSAGENS_VALIDAS, arredondar, calcular_semanas,
+                                      extrair_mensagens, filtrar_remetentes, resumir_por_remetente,
+                                      resumir_relatorio)
+from instrumentacao import etapa
+
+# Pausa sem mensagens (em horas) que também encerra uma sessão dentro do mesmo dia de trabalho.
+# Desligada por padrão: entre o "bom dia" e o aviso de saída pode não haver nenhuma mensagem
+INTERVALO_INATIVIDADE_PADRAO = None
+
+# A virada do dia de trabalho é escolhida em faixas de 15 minutos do dia
+MINUTOS_FAIXA = 15
+FAIXAS_DIA = 24 * 60 // MINUTOS_FAIXA
+
+# Peso da pausa que contém o meio do período fora do expediente, na escolha da virada: sem ele, quem
+# sempre sai às 21:30 e entra às 08:00 teria a "pausa" das 08:00 às 21:30 (mais longa) como descanso
+PESO_VIRADA_PREFERIDA = 2
+
+# Janela do adicional noturno (CLT, art. 73: das 22h às 5h)
+JANELA_NOTURNA_PADRAO = ("22:00", "05:00")
+
+# A hora noturna é reduzida (52min30s), então cada hora de relógio vale 60/52,5 horas noturnas
+FATOR_HORA_NOTURNA = 60 / 52.5
+
+# Sessões até esta duração (em horas) não têm intervalo descontado (CLT, art. 71)
+LIMITE_SEM_INTERVALO = 6.0
+
+SEGUNDOS_DIA = 86400
+
+# "HH:MM" de cada minuto do dia; indexar esta tabela é bem mais rápido que strftime por linha
+HORARIOS = np.array([f"{minuto // 60:02d}:{minuto % 60:02d}" for minuto in range(24 * 60)], dtype=object)
+
+
+def _segundos_do_dia(horario_str):
+    horario = datetime.strptime(horario_str, "%H:%M")
+    return horario.hour * 3600 + horario.minute * 60
+
+
+def _formatar_horario(data_hora, data):
+    return HORARIOS[((data_hora - data).dt.total_seconds().to_numpy() // 60).astype(np.int64)]
+
+
+def _acumulado_janela(segundos, inicio_janela, fim_janela):
+    """
+    Segundos dentro da janela diária [inicio_janela, fim_janela) desde a
+    época até cada instante (em segundos). Janelas que atravessam a
+    meia-noite (inicio > fim) são tratadas como [0, fim) + [inicio, 24h).
+    """
+    dias, segundo_do_dia = np.divmod(segundos, SEGUNDOS_DIA)
+    if inicio_janela <= fim_janela:
+        duracao = fim_janela - inicio_janela
+        return dias * duracao + np.clip(segundo_do_dia - inicio_janela, 0, duracao)
+    duracao = fim_janela + SEGUNDOS_DIA - inicio_janela
+    return dias * duracao + np.minimum(segundo_do_dia, fim_janela) + np.maximum(segundo_do_dia - inicio_janela, 0)
+
+
+def horas_na_janela(inicio, fim, horario_inicio_str, horario_fim_str):
+    """
+    Horas de cada intervalo [inicio, fim] (Series datetime64) que caem na
+    janela diária de horario_inicio_str a horario_fim_str, em qualquer dia
+    do intervalo. Calculado como diferença de acumulados, sem laço por dia.
+
+    >>> inicio = pd.Series(pd.to_datetime(["2024-01-01 20:00", "2024-01-01 20:00", "2024-01-01 07:00"]))
+    >>> fim = pd.Series(pd.to_datetime(["2024-01-02 03:00", "2024-01-03 03:00", "2024-01-02 09:00"]))
+    >>> horas_na_janela(inicio, fim, "22:00", "05:00").tolist()
+    [5.0, 12.0, 7.0]
+    >>> horas_na_janela(inicio, fim, "08:00", "18:00").tolist()
+    [0.0, 10.0, 11.0]
+    """
+    inicio_janela, fim_janela = _segundos_do_dia(horario_inicio_str), _segundos_do_dia(horario_fim_str)
+    segundos_inicio = inicio.to_numpy().astype('datetime64[s]').astype(np.int64)
+    segundos_fim = fim.to_numpy().astype('datetime64[s]').astype(np.int64)
+    return (_acumulado_janela(segundos_fim, inicio_janela, fim_janela)
+            - _acumulado_janela(segundos_inicio, inicio_janela, fim_janela)) / 3600
+
+
+def hora_virada_preferida(horario_inicio_str, horario_fim_str):
+    """
+    Hora no meio do período fora do expediente (ex.: 01:00 para 08:00 às
+    18:00), usada para desempatar a escolha da virada do dia de trabalho.
+
+    >>> hora_virada_preferida("08:00", "18:00"), hora_virada_preferida("20:00", "03:00")
+    (1, 11)
+    """
+    inicio, fim = _segundos_do_dia(horario_inicio_str) // 3600, _segundos_do_dia(horario_fim_str) // 3600
+    return (fim + (inicio - fim) % 24 // 2) % 24
+
+
+def _minuto_virada(contagem, hora_preferida):
+    """
+    Minuto do dia em que o dia de trabalho vira, a partir das mensagens por
+    faixa de 15 minutos: o meio da mais longa sequência (circular) de faixas
+    sem movimento (ou com o menor movimento), que é o descanso entre dois
+    turnos. A sequência que contém hora_preferida vale PESO_VIRADA_PREFERIDA
+    vezes o seu tamanho.
+    """
+    faixa_preferida = hora_preferida * 60 // MINUTOS_FAIXA
+    quietas = contagem == contagem.min()
+    if quietas.all():
+        return faixa_preferida * MINUTOS_FAIXA
+
+    # Gira o dia para começar logo após uma faixa movimentada: nenhuma sequência passa do fim do vetor
+    inicio = int(np.flatnonzero(~quietas)[0]) + 1
+    bordas = np.flatnonzero(np.diff(np.concatenate(([0], np.roll(quietas, -inicio).astype(np.int8), [0]))))
+    comecos, fins = bordas[::2], bordas[1::2]
+    preferida = (faixa_preferida - inicio) % FAIXAS_DIA
+    pontuacao = (fins - comecos) * np.where((comecos <= preferida) & (preferida < fins), PESO_VIRADA_PREFERIDA, 1)
+    melhor = pontuacao.argmax()
+    return (inicio * MINUTOS_FAIXA + (comecos[melhor] + fins[melhor]) * MINUTOS_FAIXA // 2) % (24 * 60)
+
+
+def agrupar_sessoes(df_mensagens, intervalo_inatividade=INTERVALO_INATIVIDADE_PADRAO, por_remetente=False,
+                    hora_preferida=1):
+    """
+    Agrupa as mensagens em sessões de trabalho, uma por dia de trabalho de
+    cada pessoa (com por_remetente) ou do grupo. O dia de trabalho não vira
+    à meia-noite, e sim no meio do descanso entre os turnos, visto nas
+    mensagens (ver _minuto_virada): um turno das 20:00 às 03:00 fica em uma
+    única sessão e nenhuma sessão passa de 24 horas. Com intervalo_inatividade (horas),
+    uma pausa maior que essa também encerra a sessão. Retorna as colunas
+    [remetente,] inicio, fim e mensagens; sem groupby, o custo é linear
+    quando as mensagens já estão em ordem.
+
+    >>> from gerador_chat import gerar_chat
+    >>> from analise_jornada_trabalho import extrair_mensagens
+    >>> df_mensagens, _ = extrair_mensagens(gerar_chat(dias=14))
+    >>> for por_remetente in (False, True):
+    ...     sessoes = agrupar_sessoes(df_mensagens, por_remetente=por_remetente)
+    ...     print(len(sessoes), (sessoes['fim'] - sessoes['inicio']).max() < pd.Timedelta(hours=24))
+    14 True
+    70 True
+    >>> df_mensagens, _ = extrair_mensagens("01/03/2024 08:00 - Ana: bom dia\\n01/03/2024 21:30 - Ana: saindo\\n"
+    ...                                     "02/03/2024 08:00 - Ana: bom dia\\n02/03/2024 17:00 - Ana: saindo")
+    >>> agrupar_sessoes(df_mensagens)[['inicio', 'fim']].astype(str).values.tolist()
+    [['2024-03-01 08:00:00', '2024-03-01 21:30:00'], ['2024-03-02 08:00:00', '2024-03-02 17:00:00']]
+    >>> df_mensagens, _ = extrair_mensagens("01/03/2024 20:00 - Ana: plantão\\n02/03/2024 03:00 - Ana: saindo")
+    >>> agrupar_sessoes(df_mensagens)[['inicio', 'fim']].astype(str).values.tolist()
+    [['2024-03-01 20:00:00', '2024-03-02 03:00:00']]
+    """
+    df = df_mensagens
+    if not df['data_hora'].is_monotonic_increasing:
+        df = df.sort_values('data_hora', kind='stable')
+    if por_remetente:
+        # Ordenação estável pelos códigos do remetente (inteiros pequenos, ordenados por radix pelo numpy),
+        # que mantém a ordem cronológica dentro de cada pessoa
+        codigos = df['remetente'].astype('category').cat.codes.to_numpy().astype(np.int64)
+        ordem = np.argsort(codigos, kind='stable')
+        df, codigos = df.iloc[ordem], codigos[ordem]
+    else:
+        codigos = np.zeros(len(df), dtype=np.int64)
+
+    data_hora = df['data_hora'].to_numpy()
+    segundos = data_hora.astype('datetime64[s]').astype(np.int64)
+
+    # Virada do dia de cada pessoa (ou do grupo), pela distribuição das mensagens ao longo do dia
+    quantidade = int(codigos.max()) + 1 if len(codigos) else 1
+    contagem = np.bincount(codigos * FAIXAS_DIA + segundos % SEGUNDOS_DIA // (MINUTOS_FAIXA * 60),
+                           minlength=quantidade * FAIXAS_DIA).reshape(quantidade, FAIXAS_DIA)
+    viradas = np.array([_minuto_virada(linha, hora_preferida) for linha in contagem], dtype=np.int64)
+    dia_trabalho = (segundos - viradas[codigos] * 60) // SEGUNDOS_DIA
+
+    nova_sessao = np.ones(len(df), dtype=bool)
+    nova_sessao[1:] = (dia_trabalho[1:] != dia_trabalho[:-1]) | (codigos[1:] != codigos[:-1])
+    if intervalo_inatividade:
+        nova_sessao[1:] |= np.diff(segundos) > intervalo_inatividade * 3600
+
+    # As mensagens de cada sessão são contíguas e em ordem: início e fim são a primeira e a última
+    inicios = np.flatnonzero(nova_sessao)
+    fins = np.append(inicios[1:], len(df)) - 1
+    df_sessoes = pd.DataFrame({
+        'inicio': data_hora[inicios],
+        'fim': data_hora[fins],
+        'mensagens': fins - inicios + 1,
+    })
+    if por_remetente:
+        df_sessoes.insert(0, 'remetente', df['remetente'].iloc[inicios].reset_index(drop=True))
+    return df_sessoes
+
+
+def calcular_sessoes_relatorio(df_sessoes, jornada_diaria, tempo_intervalo, salario_bruto, horario_inicio_str,
+                               horario_fim_str, janela_noturna=JANELA_NOTURNA_PADRAO):
+    """
+    Gera uma linha de relatório por sessão, com as mesmas colunas do
+    relatório diário (mais 'Data Saída', 'Mensagens', 'Horas Noturnas' e
+    'Horas Fora do Expediente'). O adicional noturno é calculado sobre as
+    horas da sessão dentro da janela noturna, com a hora noturna reduzida.
+    A sessão pertence ao dia (e à semana) em que começou.
+    """
+    jornada_diaria_sem_intervalo = jornada_diaria - tempo_intervalo
+
+    # Taxas CLT (ajustáveis), as mesmas do relatório diário
+    percentual_hora_extra_normal = 1.50  # 50%
+    percentual_hora_extra_atipica = 2.00  # 100%
+    percentual_adicional_noturno = 0.20  # 20%
+    valor_hora_normal = salario_bruto / 220 if salario_bruto > 0 else 0
+
+    inicio = df_sessoes['inicio'].reset_index(drop=True)
+    fim = df_sessoes['fim'].reset_index(drop=True)
+    data = inicio.dt.normalize()
+
+    jornada_bruta = (fim - inicio).dt.total_seconds() / 3600
+    desconto_intervalo = np.where(jornada_bruta > LIMITE_SEM_INTERVALO, tempo_intervalo, 0.0)
+    jornada_total = (jornada_bruta - desconto_intervalo).clip(lower=0)
+
+    horas_noturnas = pd.Series(horas_na_janela(inicio, fim, *janela_noturna))
+    horas_fora_expediente = jornada_bruta - horas_na_janela(inicio, fim, horario_inicio_str, horario_fim_str)
+
+    dia_semana_num = data.dt.weekday
+    fim_de_semana = (dia_semana_num >= 5).to_numpy()
+    horas_extras = jornada_total.where(fim_de_semana, (jornada_total - jornada_diaria_sem_intervalo).clip(lower=0))
+    percentual_hora_extra = np.where(fim_de_semana, percentual_hora_extra_atipica, percentual_hora_extra_normal)
+    custo_horas_extras = horas_extras * valor_hora_normal * percentual_hora_extra
+    adicional_noturno = horas_noturnas * FATOR_HORA_NOTURNA * valor_hora_normal * percentual_adicional_noturno
+
+    segundos_entrada = (inicio - data).dt.total_seconds().to_numpy()
+    atipico = segundos_entrada < _segundos_do_dia(horario_inicio_str)
+    virada = (fim.dt.normalize() > data).to_numpy()
+    observacoes = pd.Series(np.where(fim_de_semana, "Fim de semana", ""), dtype=object)
+    for mascara, texto in ((atipico, "Acionamento atípico"), (virada, "Virada de dia")):
+        observacoes[mascara] = (observacoes[mascara] + ", ").str.lstrip(", ") + texto
+
+    df_relatorio = pd.DataFrame({
+        "Data": data.dt.date,
+        "Dia da Semana": np.asarray(DIAS_DA_SEMANA, dtype=object)[dia_semana_num.to_numpy()],
+        "Entrada": _formatar_horario(inicio, data),
+        "Saída": _formatar_horario(fim, fim.dt.normalize()),
+        "Data Saída": fim.dt.date,
+        "Mensagens": df_sessoes['mensagens'].to_numpy(),
+        "Jornada Total": arredondar(jornada_total),
+        "Horas Noturnas": arredondar(horas_noturnas),
+        "Horas Fora do Expediente": arredondar(horas_fora_expediente),
+        "Horas Extras": arredondar(horas_extras),
+        "Custo Horas Extras": arredondar(custo_horas_extras),
+        "Adicional Noturno": arredondar(adicional_noturno),
+        "Observações": observacoes,
+    })
+    if 'remetente' in df_sessoes.columns:
+        df_relatorio.insert(0, 'Remetente', df_sessoes['remetente'].reset_index(drop=True))
+    df_relatorio['semana_do_ano'] = data.dt.isocalendar().week.astype(int).to_numpy()
+    return df_relatorio
+
+
+def calcular_relatorio_sessoes(df_mensagens, jornada_diaria, carga_horaria_semanal, tempo_intervalo, salario_bruto,
+                               horario_inicio_str, horario_fim_str, intervalo_inatividade=INTERVALO_INATIVIDADE_PADRAO,
+                               janela_noturna=JANELA_NOTURNA_PADRAO, por_remetente=False):
+    """
+    Etapa de cálculo por sessões a partir da tabela de mensagens (ver
+    extrair_mensagens). Retorna (df_relatorio, resumo); com por_remetente,
+    o resumo é um DataFrame com uma linha por remetente.
+    """
+    df_validas = df_mensagens[~df_mensagens['midia']]
+    if df_validas.empty:
+        return pd.DataFrame(), {"erro": ERRO_SEM_MENSAGENS_VALIDAS}
+
+    with etapa("agrupamento_sessoes", mensagens=len(df_validas)) as registro:
+        df_sessoes = agrupar_sessoes(df_validas, intervalo_inatividade, por_remetente,
+                                     hora_virada_preferida(horario_inicio_str, horario_fim_str))
+        registro['sessoes'] = len(df_sessoes)
+
+    with etapa("resumo", sessoes=len(df_sessoes)):
+        df_relatorio = calcular_sessoes_relatorio(df_sessoes, jornada_diaria, tempo_intervalo, salario_bruto,
+                                                  horario_inicio_str, horario_fim_str, janela_noturna)
+        if por_remetente:
+            total_semanal_df = calcular_semanas(df_relatorio, carga_horaria_semanal, ('Remetente', 'semana_do_ano'))
+            return df_relatorio, resumir_por_remetente(df_relatorio, total_semanal_df)
+        return df_relatorio, resumir_relatorio(df_relatorio, calcular_semanas(df_relatorio, carga_horaria_semanal))
+
+
+def analise_jornada_sessoes(texto_completo, jornada_diaria, carga_horaria_semanal, tempo_intervalo, salario_bruto,
+                            horario_inicio_str, horario_fim_str, intervalo_inatividade=INTERVALO_INATIVIDADE_PADRAO,
+                            janela_noturna=JANELA_NOTURNA_PADRAO, remetentes=None):
+    """
+    Analisa o chat por sessões de trabalho em vez de dias do calendário,
+    para plantões e turnos que atravessam a meia-noite (ex.: 20:00 às
+    03:00). Com 'remetentes' (lista, vazia para todos), cada pessoa tem as
+    próprias sessões.
+    """
+    df_mensagens, erro = extrair_mensagens(texto_completo)
+    if erro:
+        return pd.DataFrame(), {"erro": erro}
+
+    df_mensagens, erro = filtrar_remetentes(df_mensagens, remetentes)
+    if erro:
+        return pd.DataFrame(), {"erro": erro}
+
+    return calcular_relatorio_sessoes(df_mensagens, jornada_diaria, carga_horaria_semanal, tempo_intervalo,
+                                      salario_bruto, horario_inicio_str, horario_fim_str, intervalo_inatividade,
+                                      janela_noturna, por_remetente=remetentes is not None)
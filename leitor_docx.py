@@ -1,14 +1,105 @@
-import docx
+import io
+import zipfile
+
+from lxml import etree
+
+# Namespace principal do WordprocessingML
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+PARTE_DOCUMENTO = "word/document.xml"
+
+# Separador das células de uma linha de tabela (o mesmo do "Converter tabela em texto" do Word)
+SEPARADOR_CELULAS = "\t"
+
+
+def _runs_paragrafo(paragrafo):
+    """Runs (w:r) de um parágrafo, inclusive os de hiperlinks, na ordem do documento."""
+    for filho in paragrafo.iterchildren(W + "r", W + "hyperlink"):
+        if filho.tag == W + "r":
+            yield filho
+        else:
+            yield from filho.iterchildren(W + "r")
+
+
+def _texto_paragrafo(paragrafo):
+    """
+    Texto de um parágrafo (w:p), com tabulações e quebras de linha como no
+    python-docx. Só o conteúdo dos runs é lido: as propriedades do parágrafo
+    (w:pPr) também têm w:tab, as paradas de tabulação, que não são texto.
+    """
+    partes = []
+    for run in _runs_paragrafo(paragrafo):
+        for elemento in run.iterchildren(W + "t", W + "tab", W + "br", W + "cr"):
+            if elemento.tag == W + "t":
+                partes.append(elemento.text or "")
+            elif elemento.tag == W + "tab":
+                partes.append("\t")
+            else:
+                partes.append("\n")
+    return "".join(partes)
+
+
+def _texto_linha_tabela(linha):
+    """
+    Texto de uma linha de tabela (w:tr): as células não vazias separadas por
+    SEPARADOR_CELULAS. Parágrafos (e tabelas aninhadas) de uma célula ficam
+    na mesma linha, separados por espaço.
+    """
+    celulas = []
+    for celula in linha.iterchildren(W + "tc"):
+        texto = " ".join(filter(None, (_texto_paragrafo(p).strip() for p in celula.iter(W + "p"))))
+        if texto:
+            celulas.append(texto)
+    return SEPARADOR_CELULAS.join(celulas)
+
+
+def iterar_blocos_docx(origem):
+    """
+    Gera o texto de cada parágrafo e de cada linha de tabela do corpo do
+    documento, na ordem em que aparecem. O XML é lido em fluxo direto do
+    .docx (caminho, bytes ou buffer) e cada bloco é descartado depois de
+    entregue, então documentos grandes não são carregados inteiros na memória.
+    """
+    if isinstance(origem, (bytes, bytearray, memoryview)):
+        origem = io.BytesIO(origem)
+    with zipfile.ZipFile(origem) as pacote, pacote.open(PARTE_DOCUMENTO) as documento:
+        nivel_tabela = 0
+        for evento, elemento in etree.iterparse(documento, events=("start", "end"),
+                                                tag=(W + "p", W + "tbl", W + "tr")):
+            if elemento.tag == W + "tbl":
+                nivel_tabela += 1 if evento == "start" else -1
+            if evento == "start":
+                continue
+
+            if elemento.tag == W + "p" and nivel_tabela == 0:
+                yield _texto_paragrafo(elemento)
+            elif elemento.tag == W + "tr" and nivel_tabela == 1:
+                yield _texto_linha_tabela(elemento)
+            else:
+                # Parágrafos e linhas dentro de tabelas são lidos junto com a linha de primeiro nível
+                continue
+
+            # Libera o bloco já entregue e os irmãos anteriores que o parser ainda mantém
+            elemento.clear()
+            while elemento.getprevious() is not None:
+                del elemento.getparent()[0]
+
+
+def iterar_linhas_docx(origem):
+    """
+    Gera as linhas do documento à medida que é lido, para alimentar
+    diretamente analise_jornada_trabalho_stream.
+    """
+    for bloco in iterar_blocos_docx(origem):
+        yield from bloco.splitlines() or [""]
+
 
 def ler_docx(caminho_arquivo):
     """
-    Lê o conteúdo de um arquivo .docx e retorna o texto completo.
+    Lê o conteúdo de um arquivo .docx (caminho, bytes ou buffer), incluindo as
+    linhas das tabelas, e retorna o texto completo.
     """
-    texto_completo = []
     try:
-        doc = docx.Document(caminho_arquivo)
-        for para in doc.paragraphs:
-            texto_completo.append(para.text)
-        return "\n".join(texto_completo)
+        return "\n".join(iterar_linhas_docx(caminho_arquivo))
     except Exception as e:
         return f"Erro ao ler arquivo DOCX: {e}"
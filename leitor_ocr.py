@@ -1,15 +1,124 @@
-from PIL import Image
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps, ImageSequence
 import pytesseract
 
-def ler_imagem(caminho_arquivo):
+from cache_resultados import CacheLRU, DIRETORIO_CACHE, hash_bytes
+
+# Se você instalou o tesseract em um caminho não padrão, descomente e ajuste a linha abaixo
+# pytesseract.pytesseract.tesseract_cmd = r'C:\\Program Files\\Tesseract-OCR\\tesseract.exe'
+
+# Configuração do Tesseract: PSM 6 trata a imagem como um bloco uniforme de texto (folhas de ponto)
+CONFIG_TESSERACT = "--psm 6"
+
+# Lado maior máximo da imagem antes do OCR; fotos de celular são reduzidas
+LADO_MAXIMO = 2500
+
+# Limiar fixo de binarização (0-255), aplicado após o autocontraste. Por padrão (None) a imagem vai
+# em tons de cinza e o próprio Tesseract binariza (Otsu), o que preserva o texto de fotos com sombra
+# ou iluminação irregular; um limiar fixo só compensa em digitalizações limpas e uniformes
+LIMIAR_BINARIZACAO = None
+
+# O Tesseract lê OMP_THREAD_LIMIT apenas do ambiente: ao importar este módulo, cada processo do
+# Tesseract passa a usar uma única thread (a menos que a variável já esteja definida), já que o
+# paralelismo vem do pool de ler_imagens e várias threads por imagem disputariam os núcleos
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+# Textos reconhecidos, indexados pelo hash da imagem e pela configuração do OCR
+cache_ocr = CacheLRU(
+    max_itens=512,
+    diretorio=os.path.join(DIRETORIO_CACHE, "ocr") if DIRETORIO_CACHE else None
+)
+
+
+def _ler_bytes(origem):
+    """Normaliza a origem da imagem (caminho, bytes ou buffer) para bytes."""
+    if isinstance(origem, (bytes, bytearray, memoryview)):
+        return bytes(origem)
+    if isinstance(origem, (str, os.PathLike)):
+        with open(origem, "rb") as f:
+            return f.read()
+    if hasattr(origem, "getvalue"):
+        return origem.getvalue()
+    if hasattr(origem, "seek"):
+        origem.seek(0)
+    return origem.read()
+
+
+def preprocessar_imagem(imagem, lado_maximo=LADO_MAXIMO, limiar=LIMIAR_BINARIZACAO):
     """
-    Lê texto de uma imagem usando OCR.
+    Prepara uma imagem para o OCR: converte para tons de cinza, reduz
+    imagens muito grandes e aplica autocontraste, o que deixa o Tesseract
+    mais rápido e mais preciso em fotos de folhas de ponto. Com 'limiar',
+    também binariza com esse limiar fixo.
     """
-    try:
-        # Se você instalou o tesseract em um caminho não padrão, descomente e ajuste a linha abaixo
-        # pytesseract.pytesseract.tesseract_cmd = r'C:\\Program Files\\Tesseract-OCR\\tesseract.exe'
+    imagem = ImageOps.exif_transpose(imagem).convert("L")
+    if max(imagem.size) > lado_maximo:
+        imagem.thumbnail((lado_maximo, lado_maximo), Image.LANCZOS)
+    imagem = ImageOps.autocontrast(imagem)
+    if limiar is None:
+        return imagem
+    return imagem.point(lambda p: 255 if p > limiar else 0, mode="1")
+
 
-        texto = pytesseract.image_to_string(Image.open(caminho_arquivo))
-        return texto
+def _reconhecer(dados, config, limiar):
+    """Executa o OCR em todos os quadros (páginas de TIFF) de uma imagem."""
+    with Image.open(io.BytesIO(dados)) as imagem:
+        textos = [pytesseract.image_to_string(preprocessar_imagem(quadro, limiar=limiar), config=config)
+                  for quadro in ImageSequence.Iterator(imagem)]
+    return "\n".join(textos)
+
+
+def _processar(origem, config, limiar, usar_cache=True):
+    inicio = time.perf_counter()
+    nome = str(origem) if isinstance(origem, (str, os.PathLike)) else getattr(origem, "name", None)
+    resultado = {"arquivo": nome, "texto": "", "cache": False, "erro": ""}
+    try:
+        dados = _ler_bytes(origem)
+        chave = hash_bytes(dados + f"{config}|{limiar}".encode("utf-8"))
+        texto = cache_ocr.obter(chave) if usar_cache else None
+        if texto is None:
+            texto = _reconhecer(dados, config, limiar)
+            cache_ocr.guardar(chave, texto)
+        else:
+            resultado["cache"] = True
+        resultado["texto"] = texto
     except Exception as e:
-        return f"Erro ao ler imagem: {e}"
+        resultado["erro"] = str(e)
+    resultado["tempo"] = time.perf_counter() - inicio
+    return resultado
+
+
+def ler_imagens(arquivos, max_trabalhadores=None, config=CONFIG_TESSERACT, limiar=LIMIAR_BINARIZACAO,
+                usar_cache=True, verificar_cancelamento=None):
+    """
+    Reconhece o texto de várias imagens (inclusive TIFFs com várias páginas)
+    em um pool limitado de trabalhadores. Retorna, na ordem de entrada, um
+    dicionário por imagem com 'arquivo', 'texto', 'tempo' (s), 'cache' e 'erro'.
+    Com usar_cache=False, o OCR é refeito mesmo para imagens já reconhecidas.
+    'verificar_cancelamento' é chamada antes de cada imagem; a exceção que
+    ela levantar interrompe o lote (as imagens já em OCR terminam antes).
+    """
+    arquivos = list(arquivos)
+    max_trabalhadores = max_trabalhadores or os.cpu_count() or 1
+
+    def processar(origem):
+        if verificar_cancelamento is not None:
+            verificar_cancelamento()
+        return _processar(origem, config, limiar, usar_cache)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_trabalhadores, len(arquivos)))) as executor:
+        return list(executor.map(processar, arquivos))
+
+
+def ler_imagem(caminho_arquivo):
+    """
+    Lê texto de uma imagem usando OCR.
+    """
+    resultado = _processar(caminho_arquivo, CONFIG_TESSERACT, LIMIAR_BINARIZACAO)
+    if resultado["erro"]:
+        return f"Erro ao ler imagem: {resultado['erro']}"
+    return resultado["texto"]
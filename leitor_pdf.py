@@ -1,15 +1,125 @@
+import io
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
 import PyPDF2
 
-def ler_pdf(caminho_arquivo):
+# Abaixo deste número de páginas, a extração sequencial é mais rápida que subir um pool
+MIN_PAGINAS_PARALELO = 32
+
+# O pool pode ser criado a partir de uma thread do servidor do Streamlit, e um fork de processo com
+# várias threads pode travar; "forkserver" (ou "spawn", onde não existe) inicia os processos limpos
+CONTEXTO_PROCESSOS = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+
+# Os processos do pool importam este módulo pelo nome, com o sys.path do momento em que são iniciados
+DIRETORIO_MODULO = os.path.dirname(os.path.abspath(__file__))
+
+# Leitor aberto uma única vez em cada processo do pool
+_pdf_reader_processo = None
+
+
+def _ler_bytes(origem):
+    """
+    Normaliza a origem do PDF para bytes: aceita bytes, um buffer
+    (BytesIO, arquivo enviado pelo Streamlit) ou um caminho.
+    """
+    if isinstance(origem, (bytes, bytearray, memoryview)):
+        return bytes(origem)
+    if isinstance(origem, (str, os.PathLike)):
+        with open(origem, "rb") as f:
+            return f.read()
+    if hasattr(origem, "getvalue"):
+        return origem.getvalue()
+    if hasattr(origem, "seek"):
+        origem.seek(0)
+    return origem.read()
+
+
+@contextmanager
+def _modulo_importavel():
+    """
+    Garante o diretório deste módulo no sys.path enquanto os processos do
+    pool são iniciados. O Streamlit só inclui o diretório do app durante a
+    execução do script, e a leitura pode continuar numa thread depois dela.
+    """
+    if DIRETORIO_MODULO in sys.path:
+        yield
+        return
+    sys.path.append(DIRETORIO_MODULO)
+    try:
+        yield
+    finally:
+        try:
+            sys.path.remove(DIRETORIO_MODULO)
+        except ValueError:
+            pass
+
+
+def _inicializar_processo(dados):
+    global _pdf_reader_processo
+    _pdf_reader_processo = PyPDF2.PdfReader(io.BytesIO(dados))
+
+
+def _extrair_paginas(intervalo):
+    inicio, fim = intervalo
+    return [_pdf_reader_processo.pages[i].extract_text() or "" for i in range(inicio, fim)]
+
+
+def iterar_paginas_pdf(origem, processos=None):
+    """
+    Gera o texto do PDF página a página, em ordem. Documentos grandes têm
+    as páginas extraídas em paralelo por um pool de processos, e cada bloco
+    é entregue assim que fica pronto, sem esperar o arquivo inteiro.
+    """
+    dados = _ler_bytes(origem)
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(dados))
+    total_paginas = len(pdf_reader.pages)
+    processos = processos or os.cpu_count() or 1
+
+    if processos == 1 or total_paginas < MIN_PAGINAS_PARALELO:
+        for page in pdf_reader.pages:
+            yield page.extract_text() or ""
+        return
+
+    # Blocos menores que o total por processo, para começar a entregar páginas cedo
+    tamanho_bloco = max(1, min(16, total_paginas // (processos * 4)))
+    intervalos = [(inicio, min(inicio + tamanho_bloco, total_paginas))
+                  for inicio in range(0, total_paginas, tamanho_bloco)]
+
+    executor = ProcessPoolExecutor(max_workers=processos, mp_context=CONTEXTO_PROCESSOS,
+                                   initializer=_inicializar_processo, initargs=(dados,))
+    concluido = False
+    try:
+        # Os processos são iniciados à medida que os blocos são enviados, todos dentro do map
+        with _modulo_importavel():
+            resultados = executor.map(_extrair_paginas, intervalos)
+        for paginas in resultados:
+            yield from paginas
+        concluido = True
+    finally:
+        # Se o gerador for fechado antes do fim (ex.: leitura cancelada), descarta os blocos
+        # pendentes em vez de esperar o pool extrair o resto do documento
+        executor.shutdown(wait=concluido, cancel_futures=not concluido)
+
+
+def iterar_linhas_pdf(origem, processos=None):
+    """
+    Gera as linhas do PDF à medida que as páginas são extraídas, para
+    alimentar diretamente analise_jornada_trabalho_stream.
+    """
+    for texto_pagina in iterar_paginas_pdf(origem, processos):
+        yield from texto_pagina.splitlines()
+
+
+def ler_pdf(caminho_arquivo, processos=None):
     """
-    Lê o conteúdo de um arquivo .pdf e retorna o texto completo.
+    Lê o conteúdo de um arquivo .pdf (caminho, bytes ou buffer) e retorna o texto completo.
     """
-    texto_completo = ""
     try:
-        with open(caminho_arquivo, "rb") as f:
-            pdf_reader = PyPDF2.PdfReader(f)
-            for page in pdf_reader.pages:
-                texto_completo += page.extract_text()
-        return texto_completo
+        return "\n".join(iterar_paginas_pdf(caminho_arquivo, processos))
     except Exception as e:
         return f"Erro ao ler arquivo PDF: {e}"
@@ -0,0 +1,250 @@
+import argparse
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from analise_jornada_trabalho import analise_jornada_trabalho, analise_jornada_trabalho_stream
+
+EXTENSOES_SUPORTADAS = {'.txt', '.docx', '.pdf', '.png', '.jpg', '.jpeg', '.tif', '.tiff'}
+
+# Parâmetros padrão, os mesmos da interface do app
+PARAMETROS_PADRAO = {
+    'salario': 2000.0,
+    'jornada_diaria': 8.0,
+    'jornada_semanal': 44.0,
+    'intervalo': 1.0,
+    'horario_inicio': "08:00",
+    'horario_fim': "18:00",
+}
+
+
+def extrair_texto(caminho_arquivo):
+    """
+    Extrai o texto de um arquivo de registros conforme a extensão.
+    Os leitores são importados apenas quando necessários, para que a
+    falta do Tesseract, por exemplo, não impeça o processamento de .txt.
+    """
+    extensao = Path(caminho_arquivo).suffix.lower()
+    if extensao == '.pdf':
+        from leitor_pdf import ler_pdf
+        # O lote já paraleliza por arquivo; evita um pool de páginas dentro de cada processo
+        return ler_pdf(caminho_arquivo, processos=1)
+    if extensao == '.docx':
+        from leitor_docx import ler_docx
+        return ler_docx(caminho_arquivo)
+    if extensao in ('.png', '.jpg', '.jpeg', '.tif', '.tiff'):
+        from leitor_ocr import ler_imagem
+        return ler_imagem(caminho_arquivo)
+    if extensao == '.txt':
+        return Path(caminho_arquivo).read_text(encoding='utf-8', errors='replace')
+    raise ValueError(f"Tipo de arquivo não suportado: {caminho_arquivo}")
+
+
+def iterar_linhas_arquivo(caminho_arquivo):
+    """
+    Para os formatos lidos em fluxo (.pdf e .docx), retorna um iterador das
+    linhas do arquivo, para que a análise comece antes do fim da extração;
+    para os demais, retorna None.
+    """
+    extensao = Path(caminho_arquivo).suffix.lower()
+    if extensao == '.pdf':
+        from leitor_pdf import iterar_linhas_pdf
+        # O lote já paraleliza por arquivo; evita um pool de páginas dentro de cada processo
+        return iterar_linhas_pdf(caminho_arquivo, processos=1)
+    if extensao == '.docx':
+        from leitor_docx import iterar_linhas_docx
+        return iterar_linhas_docx(caminho_arquivo)
+    return None
+
+
+def _contar_linhas(linhas, resultado):
+    """Repassa as linhas de um iterável contando-as em resultado['linhas']."""
+    for linha in linhas:
+        resultado['linhas'] += 1
+        yield linha
+
+
+def processar_arquivo(tarefa):
+    """
+    Extrai e analisa um único arquivo. Executado nos processos do pool,
+    retorna o relatório, o resumo e as métricas de tempo do arquivo.
+    """
+    inicio = time.perf_counter()
+    resultado = {
+        'funcionario': tarefa['funcionario'],
+        'arquivo': str(tarefa['arquivo']),
+        'df_relatorio': pd.DataFrame(),
+        'resumo': {},
+        'linhas': 0,
+        'erro': "",
+    }
+    parametros = (
+        tarefa['jornada_diaria'],
+        tarefa['jornada_semanal'],
+        tarefa['intervalo'],
+        tarefa['salario'],
+        tarefa['horario_inicio'],
+        tarefa['horario_fim'],
+    )
+    try:
+        linhas = iterar_linhas_arquivo(tarefa['arquivo'])
+        if linhas is not None:
+            # As páginas e os parágrafos seguem direto para a análise, sem montar o texto inteiro
+            df_relatorio, resumo = analise_jornada_trabalho_stream(_contar_linhas(linhas, resultado), *parametros)
+        else:
+            texto = extrair_texto(tarefa['arquivo'])
+            resultado['linhas'] = texto.count('\n') + 1 if texto else 0
+            df_relatorio, resumo = analise_jornada_trabalho(texto, *parametros)
+        resultado['df_relatorio'] = df_relatorio
+        resultado['resumo'] = resumo
+        resultado['erro'] = resumo.get('erro', "")
+    except Exception as e:
+        resultado['erro'] = str(e)
+
+    resultado['tempo'] = time.perf_counter() - inicio
+    resultado['linhas_por_segundo'] = resultado['linhas'] / resultado['tempo'] if resultado['tempo'] > 0 else 0
+    return resultado
+
+
+def montar_tarefas(entrada, manifesto=None, parametros=None):
+    """
+    Monta a lista de tarefas a partir de um diretório (um arquivo por
+    funcionário, parâmetros padrão) ou de um manifesto CSV com as colunas
+    'arquivo' e, opcionalmente, 'funcionario', 'salario', 'jornada_diaria',
+    'jornada_semanal', 'intervalo', 'horario_inicio' e 'horario_fim'.
+    """
+    parametros = {**PARAMETROS_PADRAO, **(parametros or {})}
+
+    if manifesto:
+        df_manifesto = pd.read_csv(manifesto, sep=None, engine='python', dtype=str, keep_default_na=False)
+        base = Path(manifesto).parent
+        tarefas = []
+        for linha in df_manifesto.to_dict('records'):
+            caminho = Path(linha['arquivo'].strip())
+            if not caminho.is_absolute():
+                caminho = base / caminho
+            funcionario = linha.get('funcionario', "").strip() or caminho.stem
+            tarefa = {**parametros, 'arquivo': caminho, 'funcionario': funcionario}
+            for chave, padrao in parametros.items():
+                valor = linha.get(chave, "").strip()
+                if valor:
+                    tarefa[chave] = valor if isinstance(padrao, str) else float(valor.replace(',', '.'))
+            tarefas.append(tarefa)
+        return tarefas
+
+    arquivos = sorted(p for p in Path(entrada).rglob('*')
+                      if p.is_file() and p.suffix.lower() in EXTENSOES_SUPORTADAS)
+    return [{**parametros, 'arquivo': caminho, 'funcionario': caminho.stem} for caminho in arquivos]
+
+
+def processar_lote(tarefas, processos=None):
+    """
+    Distribui as tarefas em um pool de processos (por padrão, um por
+    núcleo) e retorna os resultados na mesma ordem das tarefas.
+    """
+    processos = processos or os.cpu_count() or 1
+    resultados = [None] * len(tarefas)
+    inicio = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        futuros = {executor.submit(processar_arquivo, tarefa): indice for indice, tarefa in enumerate(tarefas)}
+        for concluidos, futuro in enumerate(as_completed(futuros), 1):
+            resultado = futuro.result()
+            resultados[futuros[futuro]] = resultado
+            logging.info(
+                f"[{concluidos}/{len(tarefas)}] {resultado['arquivo']}: {resultado['tempo']:.2f}s, "
+                f"{resultado['linhas_por_segundo']:.0f} linhas/s"
+                + (f" - {resultado['erro']}" if resultado['erro'] else ""))
+
+    tempo_total = time.perf_counter() - inicio
+    total_linhas = sum(r['linhas'] for r in resultados)
+    logging.info(f"{len(tarefas)} arquivos em {tempo_total:.2f}s "
+                 f"({len(tarefas) / tempo_total if tempo_total > 0 else 0:.1f} arquivos/s, "
+                 f"{total_linhas / tempo_total if tempo_total > 0 else 0:.0f} linhas/s) com {processos} processos")
+    return resultados
+
+
+def _nome_aba(nome, usados):
+    """Gera um nome de aba válido (até 31 caracteres) e único no Excel."""
+    base = re.sub(r'[\[\]:*?/\\]', '_', str(nome)).strip() or "Funcionario"
+    base = base[:31]
+    nome_aba, contador = base, 1
+    while nome_aba.lower() in usados:
+        sufixo = f" ({contador})"
+        nome_aba = base[:31 - len(sufixo)] + sufixo
+        contador += 1
+    usados.add(nome_aba.lower())
+    return nome_aba
+
+
+def consolidar_resultados(resultados):
+    """Monta a tabela consolidada, com uma linha de resumo e métricas por arquivo."""
+    linhas = []
+    for resultado in resultados:
+        resumo = {chave: valor for chave, valor in resultado['resumo'].items() if chave != 'erro'}
+        linhas.append({
+            'Funcionário': resultado['funcionario'],
+            'Arquivo': resultado['arquivo'],
+            **resumo,
+            'Dias Analisados': len(resultado['df_relatorio']),
+            'Linhas': resultado['linhas'],
+            'Tempo (s)': round(resultado['tempo'], 3),
+            'Linhas/s': round(resultado['linhas_por_segundo'], 1),
+            'Erro': resultado['erro'],
+        })
+    return pd.DataFrame(linhas)
+
+
+def exportar_lote(resultados, caminho_saida):
+    """Grava o relatório consolidado e uma aba detalhada por funcionário."""
+    usados = {'consolidado'}
+    with pd.ExcelWriter(caminho_saida, engine='openpyxl') as writer:
+        consolidar_resultados(resultados).to_excel(writer, sheet_name='Consolidado', index=False)
+        for resultado in resultados:
+            if resultado['df_relatorio'].empty:
+                continue
+            resultado['df_relatorio'].to_excel(
+                writer, sheet_name=_nome_aba(resultado['funcionario'], usados), index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Analisa em lote os registros de ponto de vários funcionários, em paralelo.")
+    parser.add_argument('entrada', nargs='?', default='.', help="Diretório com os arquivos de registros.")
+    parser.add_argument('--manifesto', help="CSV com os arquivos e os parâmetros de cada funcionário.")
+    parser.add_argument('--saida', default='relatorio_lote.xlsx', help="Arquivo Excel consolidado de saída.")
+    parser.add_argument('--processos', type=int, default=None, help="Número de processos (padrão: núcleos da CPU).")
+    parser.add_argument('--salario', type=float, default=PARAMETROS_PADRAO['salario'])
+    parser.add_argument('--jornada-diaria', type=float, default=PARAMETROS_PADRAO['jornada_diaria'])
+    parser.add_argument('--jornada-semanal', type=float, default=PARAMETROS_PADRAO['jornada_semanal'])
+    parser.add_argument('--intervalo', type=float, default=PARAMETROS_PADRAO['intervalo'])
+    parser.add_argument('--horario-inicio', default=PARAMETROS_PADRAO['horario_inicio'])
+    parser.add_argument('--horario-fim', default=PARAMETROS_PADRAO['horario_fim'])
+    args = parser.parse_args(argv)
+
+    parametros = {
+        'salario': args.salario,
+        'jornada_diaria': args.jornada_diaria,
+        'jornada_semanal': args.jornada_semanal,
+        'intervalo': args.intervalo,
+        'horario_inicio': args.horario_inicio,
+        'horario_fim': args.horario_fim,
+    }
+    tarefas = montar_tarefas(args.entrada, args.manifesto, parametros)
+    if not tarefas:
+        logging.warning("Nenhum arquivo encontrado para análise.")
+        return 1
+
+    resultados = processar_lote(tarefas, args.processos)
+    exportar_lote(resultados, args.saida)
+    logging.info(f"Relatório consolidado salvo em {args.saida}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())